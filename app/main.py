@@ -5,15 +5,24 @@ The App: Marketplace contact engine optimization.
 """
 
 from fastapi import FastAPI
-from pydantic import BaseModel
+from starlette.concurrency import run_in_threadpool
 from starlette.requests import Request
+import json
 import logging
-from datetime import datetime
-from fastapi import FastAPI, APIRouter, Depends
+import os
+import time
+from typing import List
+from fastapi import FastAPI, APIRouter, Depends, HTTPException, WebSocket, WebSocketDisconnect
+from pydantic import ValidationError
 
-from .optims.optim_exp import OptimExp
-from .optims.optim_nbinomial import OptimNegBinom
-from .optims.optim_stoch_constraint import OptimStochConstraint
+from .optims.coalescing import CallbackCoalescer
+from .optims.prior_refresh import priors
+from .optims.registry import OPTIMIZERS, get_optimizer, optim_portfolio
+from .preload import preload_enabled, warm
+from .schemas import ModelParams, PortfolioParams, SessionDelta
+from .shadow import from_env as shadow_from_env
+from .sessions import OpeningSession
+from .streaming import ingest_ndjson
 
 
 logging.basicConfig(filename='log',
@@ -40,13 +49,50 @@ app = FastAPI(title="Job and Talent - Technical Interview",
 ## https://github.com/tiangolo/fastapi/issues/394
 api_router = APIRouter()
 
+# Learned priors written by `python -m app.optims.prior_refresh`
+PRIORS_PATH = os.getenv("PRIORS_PATH")
+PRIORS_REFRESH_SECONDS = float(os.getenv("PRIORS_REFRESH_SECONDS", "30"))
 
-class ModelParams(BaseModel):
-    now: datetime
-    deadline: datetime
-    num_vacancies: int
-    num_remaining_in_pool: int
-    impacted_candidates_data: list
+
+# Opt-in callback coalescing: callbacks are moved onto shared COALESCE_TICK_MINUTES
+# boundaries, so the dispatcher can call the openings of a tick through /batch/
+COALESCE_TICK_MINUTES = os.getenv("COALESCE_TICK_MINUTES")
+COALESCE_TOLERANCE_MINUTES = float(os.getenv("COALESCE_TOLERANCE_MINUTES", "10"))
+coalescer = CallbackCoalescer(int(COALESCE_TICK_MINUTES), COALESCE_TOLERANCE_MINUTES) if COALESCE_TICK_MINUTES else None
+
+
+def coalesce(params, finished, callback_time_minutes) -> int:
+    if coalescer is None or finished:
+        return int(callback_time_minutes)
+    return coalescer.snap(params.now, params.deadline, int(callback_time_minutes))
+
+
+# Shadow candidates replayed off the request path, see app/shadow.py
+shadow = shadow_from_env()
+
+
+def submit_shadow(route, params, finished, num_candidates_needed, callback_time_minutes, t0) -> None:
+    if shadow is not None:
+        shadow.submit(route, params, (finished, num_candidates_needed, callback_time_minutes), time.perf_counter() - t0)
+
+
+# Pre-fork mode: gunicorn imports the app in the master (see docker/gunicorn_conf.py),
+# the read-only state is built here once and shared copy-on-write by the workers
+if preload_enabled():
+    logger.info(f"PRELOAD {warm(PRIORS_PATH)}.")
+
+
+@app.on_event("startup")
+def load_priors():
+    if PRIORS_PATH:
+        priors.load(PRIORS_PATH)
+        priors.watch(PRIORS_PATH, PRIORS_REFRESH_SECONDS)
+
+
+@app.on_event("startup")
+def start_shadow():
+    if shadow is not None:
+        shadow.start()
 
 
 @app.get("/")
@@ -63,7 +109,8 @@ def predict(param1: int, param2: int):
 
 @api_router.post("/optim-exp/", tags=["optim-exp"])
 def post_predict(params: ModelParams):
-    finished, num_candidates_needed, callback_time_minutes = OptimExp(is_decay=False).invitation_logic_api(
+    t0 = time.perf_counter()
+    finished, num_candidates_needed, callback_time_minutes = get_optimizer("optim-exp").invitation_logic_api(
         now=params.now,
         deadline=params.deadline,
         num_vacancies=params.num_vacancies,
@@ -71,6 +118,8 @@ def post_predict(params: ModelParams):
         impacted_candidates_data=params.impacted_candidates_data
     )
 
+    submit_shadow("optim-exp", params, finished, num_candidates_needed, callback_time_minutes, t0)
+    callback_time_minutes = coalesce(params, finished, callback_time_minutes)
     logger.info(f"POST RESP {bool(finished)}.")
 
     return bool(finished), int(num_candidates_needed), int(callback_time_minutes)
@@ -78,7 +127,8 @@ def post_predict(params: ModelParams):
 
 @api_router.post("/optim-nbinomial/", tags=["optim-nbinomial"])
 def post_predict(params: ModelParams):
-    finished, num_candidates_needed, callback_time_minutes = OptimNegBinom().invitation_logic_api(
+    t0 = time.perf_counter()
+    finished, num_candidates_needed, callback_time_minutes = get_optimizer("optim-nbinomial").invitation_logic_api(
         now=params.now,
         deadline=params.deadline,
         num_vacancies=params.num_vacancies,
@@ -86,6 +136,8 @@ def post_predict(params: ModelParams):
         impacted_candidates_data=params.impacted_candidates_data
     )
 
+    submit_shadow("optim-nbinomial", params, finished, num_candidates_needed, callback_time_minutes, t0)
+    callback_time_minutes = coalesce(params, finished, callback_time_minutes)
     logger.info(f"POST RESP {bool(finished)}.")
 
     return bool(finished), int(num_candidates_needed), int(callback_time_minutes)
@@ -93,7 +145,8 @@ def post_predict(params: ModelParams):
 
 @api_router.post("/optim-stoch-constraint/", tags=["optim-stoch-constraint"])
 def post_predict(params: ModelParams):
-    finished, num_candidates_needed, callback_time_minutes = OptimStochConstraint(beta_mean=0.2, beta_var=0.001).invitation_logic_api(
+    t0 = time.perf_counter()
+    finished, num_candidates_needed, callback_time_minutes = get_optimizer("optim-stoch-constraint").invitation_logic_api(
         now=params.now,
         deadline=params.deadline,
         num_vacancies=params.num_vacancies,
@@ -101,11 +154,138 @@ def post_predict(params: ModelParams):
         impacted_candidates_data=params.impacted_candidates_data
     )
 
+    submit_shadow("optim-stoch-constraint", params, finished, num_candidates_needed, callback_time_minutes, t0)
+    callback_time_minutes = coalesce(params, finished, callback_time_minutes)
+    logger.info(f"POST RESP {bool(finished)}.")
+
+    return bool(finished), int(num_candidates_needed), int(callback_time_minutes)
+
+
+@api_router.post("/batch/{optimizer}/", tags=["batch"])
+def post_batch(optimizer: str, params: List[ModelParams]):
+    '''The openings of one tick in one request, each decided as on its own route.
+    '''
+    if optimizer not in OPTIMIZERS:
+        raise HTTPException(status_code=404, detail=f"Unknown optimizer {optimizer}")
+    out = []
+    for p in params:
+        t0 = time.perf_counter()
+        finished, num_candidates_needed, callback_time_minutes = get_optimizer(optimizer).invitation_logic_api(
+            now=p.now,
+            deadline=p.deadline,
+            num_vacancies=p.num_vacancies,
+            num_remaining_in_pool=p.num_remaining_in_pool,
+            impacted_candidates_data=p.impacted_candidates_data
+        )
+        submit_shadow(optimizer, p, finished, num_candidates_needed, callback_time_minutes, t0)
+        out.append((bool(finished), int(num_candidates_needed), coalesce(p, finished, callback_time_minutes)))
+
+    logger.info(f"POST RESP batch {optimizer} {len(out)} openings.")
+
+    return out
+
+
+@app.get("/coalescing/", tags=["batch"])
+def coalescing_report():
+    '''Expected reduction of dispatcher wake-ups, over the recent callbacks.
+    '''
+    if coalescer is None:
+        return {"enabled": False}
+    return dict(coalescer.report(), enabled=True, tick_minutes=coalescer.tick_minutes)
+
+
+@app.get("/shadow/", tags=["shadow"])
+def shadow_report():
+    '''Shadow candidates compared with the primary optimizers.
+    '''
+    if shadow is None:
+        return {"enabled": False}
+    return dict(shadow.report(), enabled=True)
+
+
+@api_router.post("/optim-portfolio/", tags=["optim-portfolio"])
+def post_portfolio(params: PortfolioParams):
+    '''One joint allocation for a batch of openings sharing candidate pools.
+    '''
+    try:
+        decisions = optim_portfolio().invitation_logic_portfolio(
+            [o.dict() for o in params.openings],
+            pools=[p.openings for p in params.pools],
+            pool_capacity=[p.capacity for p in params.pools]
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+    logger.info(f"POST RESP portfolio {len(decisions)} openings.")
+
+    return [(bool(f), int(n), int(c)) for f, n, c in decisions]
+
+
+@app.post("/stream/{optimizer}/", tags=["stream"])
+async def post_stream(optimizer: str, request: Request):
+    '''NDJSON body: a header line with the ModelParams scalars, then one impact record per line.
+    '''
+    if optimizer not in OPTIMIZERS:
+        raise HTTPException(status_code=404, detail=f"Unknown optimizer {optimizer}")
+    try:
+        header, aggregate = await ingest_ndjson(request.stream())
+    except (ValidationError, ValueError) as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    if header is None:
+        raise HTTPException(status_code=422, detail="Empty body")
+    logger.info(f"POST STREAM {optimizer} {json.dumps(dict(json.loads(header.json()), impacts=aggregate.summary()))}.")
+    finished, num_candidates_needed, callback_time_minutes = await run_in_threadpool(
+        get_optimizer(optimizer).invitation_logic_api,
+        now=header.now,
+        deadline=header.deadline,
+        num_vacancies=header.num_vacancies,
+        num_remaining_in_pool=header.num_remaining_in_pool,
+        impacted_candidates_data=aggregate
+    )
+
+    callback_time_minutes = coalesce(header, finished, callback_time_minutes)
     logger.info(f"POST RESP {bool(finished)}.")
 
     return bool(finished), int(num_candidates_needed), int(callback_time_minutes)
 
 
+@app.websocket("/sessions/{optimizer}/{correlation_prefix}")
+async def opening_session(websocket: WebSocket, optimizer: str, correlation_prefix: str):
+    await websocket.accept()
+    if optimizer not in OPTIMIZERS:
+        await websocket.close(code=1008)
+        return
+    session = OpeningSession(optimizer, correlation_prefix)
+    logger.info(f"SESSION OPEN {optimizer} {correlation_prefix}.")
+    try:
+        while True:
+            try:
+                delta = SessionDelta(**await websocket.receive_json())
+                t0 = time.perf_counter()
+                finished, num_candidates_needed, callback_time_minutes = await run_in_threadpool(session.apply, delta)
+            except (ValidationError, ValueError, TypeError) as e:
+                await websocket.send_json({"error": str(e)})
+                continue
+            except WebSocketDisconnect:
+                raise
+            except Exception as e:
+                # an optimizer failure ends this call, not the session
+                logger.exception(f"SESSION {correlation_prefix} call failed.")
+                await websocket.send_json({"error": repr(e)})
+                continue
+            # the resolved request, in the POST REQ format replay and prior_refresh read
+            logger.info(f"POST REQ {str(json.loads(session.request.json()))}.")
+            submit_shadow(optimizer, session.request, finished, num_candidates_needed, callback_time_minutes, t0)
+            callback_time_minutes = coalesce(session.request, finished, callback_time_minutes)
+            await websocket.send_json([finished, num_candidates_needed, callback_time_minutes])
+            if finished:
+                await websocket.close()
+                break
+    except WebSocketDisconnect:
+        pass
+    logger.info(f"SESSION CLOSE {correlation_prefix} after {session.n_calls} calls.")
+
+
 async def log_json(request: Request):
     logger.info(f"POST REQ {str(await request.json())}.")
     print(await request.json())
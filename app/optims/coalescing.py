@@ -0,0 +1,112 @@
+"""
+Server-side coalescing of callback times.
+
+Every optimizer returns its own callback_time_minutes, so thousands of openings wake the
+dispatcher at scattered minutes, one request each. The coalescer moves the wake-up
+(now + callback) to the nearest shared tick boundary, when that is within the tolerance
+and still before the deadline; otherwise the callback is left as it is. Openings woken
+on the same tick can then be sent together through the batch route.
+
+It also keeps the last wake-ups it saw, raw and coalesced, to report the expected
+reduction in dispatcher wake-ups.
+
+    COALESCE_TICK_MINUTES=15 COALESCE_TOLERANCE_MINUTES=10 uvicorn app.main:app
+"""
+
+import datetime as dt
+import math
+import threading
+from collections import deque
+from typing import Dict
+
+EPOCH = dt.datetime(1970, 1, 1)
+TICK_MINUTES = 15
+TOLERANCE_MINUTES = 10
+RELATIVE_TOLERANCE = 0.5
+MIN_CALLBACK = 1
+
+
+def _minutes(ts: dt.datetime) -> float:
+    if ts.tzinfo is not None:
+        ts = ts.astimezone(dt.timezone.utc).replace(tzinfo=None)
+    return (ts - EPOCH).total_seconds() / 60
+
+
+class CallbackCoalescer():
+    def __init__(
+        self,
+        tick_minutes: int = TICK_MINUTES,
+        tolerance_minutes: float = TOLERANCE_MINUTES,
+        relative_tolerance: float = RELATIVE_TOLERANCE,
+        min_callback: int = MIN_CALLBACK,
+        history: int = 100000
+        ) -> None:
+        '''
+        ---
+        params:
+            tick_minutes: spacing of the shared wake-up boundaries
+            tolerance_minutes: largest shift of a wake-up, in minutes
+            relative_tolerance: largest shift as a fraction of the callback, so short
+                callbacks are barely moved
+            min_callback: smallest callback returned
+            history: wake-ups kept for the report
+        '''
+        if tick_minutes <= 0:
+            raise ValueError("tick_minutes must be positive")
+        self.tick_minutes = tick_minutes
+        self.tolerance_minutes = tolerance_minutes
+        self.relative_tolerance = relative_tolerance
+        self.min_callback = min_callback
+        self.wakeups = deque(maxlen=history)
+        self.n_snapped = 0
+        self.lock = threading.Lock()
+
+    def snap_minutes(self, now: float, deadline: float, callback_time_minutes: int) -> int:
+        '''Coalesce a callback on a clock in minutes.
+        ---
+        params:
+            now: current minute
+            deadline: deadline minute
+            callback_time_minutes: callback returned by the optimizer
+        returns:
+            callback_time_minutes, moved onto a tick boundary when allowed
+        '''
+        if callback_time_minutes <= 0:
+            return callback_time_minutes
+        wake = now + callback_time_minutes
+        tolerance = min(self.tolerance_minutes, self.relative_tolerance * callback_time_minutes)
+        lower = math.floor(wake / self.tick_minutes) * self.tick_minutes
+        out = callback_time_minutes
+        for boundary in sorted((lower, lower + self.tick_minutes), key=lambda b: abs(b - wake)):
+            # whole minutes, so the wake-up lands on the boundary or less than a minute after
+            callback = math.ceil(boundary - now - 1e-9)
+            if abs(boundary - wake) <= tolerance and callback >= self.min_callback and now + callback < deadline:
+                out = callback
+                break
+        with self.lock:
+            self.wakeups.append((math.floor(wake), math.floor(now + out)))
+            self.n_snapped += out != callback_time_minutes
+        return out
+
+    def snap(self, now: dt.datetime, deadline: dt.datetime, callback_time_minutes: int) -> int:
+        '''Coalesce a callback on the wall clock, with boundaries shared by every opening.
+        '''
+        return self.snap_minutes(_minutes(now), _minutes(deadline), callback_time_minutes)
+
+    def report(self) -> Dict[str, float]:
+        '''Expected reduction of dispatcher wake-ups over the recent callbacks: a wake-up
+        is a distinct minute with at least one opening to call.
+        '''
+        with self.lock:
+            wakeups = list(self.wakeups)
+            n_snapped = self.n_snapped
+        raw = len({w for w, _ in wakeups})
+        coalesced = len({w for _, w in wakeups})
+        return {
+            'callbacks': len(wakeups),
+            'snapped_total': n_snapped,
+            'raw_wakeups': raw,
+            'coalesced_wakeups': coalesced,
+            'wakeup_reduction': 1 - coalesced / raw if raw else 0.0,
+            'mean_cohort_size': len(wakeups) / coalesced if coalesced else 0.0,
+        }
@@ -0,0 +1,7 @@
+'''
+Economics of an opening, shared by the optimizers and the evaluation. Kept free of
+heavy imports so the scenario tooling does not pull in the solver stack.
+'''
+
+PROFIT_VACANCY = 2500
+COST_SPAM = 20
@@ -1,4 +1,4 @@
-from typing import Optional, Tuple
+from typing import List, Optional, Tuple
 import numpy as np
 import datetime as dt
 from scipy.stats import nbinom, beta
@@ -17,6 +17,16 @@ class Optim(ABC):
     )-> Tuple[bool, int, Optional[int]]:
         raise NotImplementedError
 
+    def invitation_logic_batch(self, requests: List[dict]) -> List[Tuple[bool, int, Optional[int]]]:
+        '''Decide a batch of requests at once. Agents with a vectorized path override it.
+        ---
+        params:
+            requests: list of invitation_logic_api keyword arguments
+        returns:
+            list of (finished, num_candidates_needed, callback_time_minutes)
+        '''
+        return [self.invitation_logic_api(**req) for req in requests]
+
 
 class NegativeBinomial():
     def __init__(self, prior_beta_mu: int = 1, prior_beta_var: int = 1, nbin_r: int = 5) -> None:
@@ -0,0 +1,241 @@
+"""
+Precomputed decision surfaces for OptimNegBinom and OptimExp.
+
+The OptimNegBinom invitation count only depends on the posterior (alpha, beta), and the
+OptimExp callback only on the opening length and the minutes since its estimated start.
+Both are tabulated on a grid, saved as .npy files and loaded memory-mapped, and read by
+indexing or interpolating the grid.
+
+The tables are offline tools: bulk simulations and sweeps can run OptimNegBinomLookup
+and OptimExpLookup, and `report` measures their accuracy. The API routes keep the live
+models: a table is keyed on the posterior and the time offsets, not on the request, so a
+route still computes the aggregates per request, and serving from the tables measured
+slower than the closed-form models while changing some of their decisions.
+
+    python -m app.optims.lookup_tables export tables/
+    python -m app.optims.lookup_tables report tables/
+"""
+
+import argparse
+import datetime as dt
+import json
+import os
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from .homework import NegativeBinomial
+from .optim_exp import FREQ_SPLIT, OptimExp
+from .optim_nbinomial import PRIOR_BETA_MU, PRIOR_BETA_VAR, OptimNegBinom
+from .posterior_store import NegativeBinomialStore
+
+# Route posteriors start at the prior (alpha ~ 11, beta ~ 260) and grow with every update
+NBINOM_ALPHA_AXIS = np.geomspace(1.01, 1e3, 2048)
+NBINOM_BETA_AXIS = np.geomspace(1, 1e5, 2048)
+EXP_T_DIFF_AXIS = np.unique(np.round(np.geomspace(2, 60 * 1440, 256)))
+EXP_M_INIT_AXIS = np.unique(np.round(np.concatenate([
+    -np.geomspace(1, 7 * 1440, 128), [0], np.geomspace(1, 60 * 1440, 128)
+])))
+T0 = dt.datetime(2022, 1, 1)
+
+
+class DecisionTable():
+    def __init__(self, axes: List[np.ndarray], values: np.ndarray, meta: Optional[dict] = None) -> None:
+        '''Values of a policy on a rectilinear grid.
+        ---
+        params:
+            axes: sorted grid coordinates, one array per dimension
+            values: array of shape (len(axes[0]), len(axes[1]), ...)
+            meta: parameters the table was built with
+        '''
+        self.axes = axes
+        self.values = values
+        self.meta = meta or {}
+
+    def save(self, path: str) -> None:
+        os.makedirs(path, exist_ok=True)
+        np.save(os.path.join(path, 'values.npy'), np.ascontiguousarray(self.values))
+        for i, axis in enumerate(self.axes):
+            np.save(os.path.join(path, f'axis_{i}.npy'), axis)
+        with open(os.path.join(path, 'meta.json'), 'w') as f:
+            json.dump(dict(self.meta, ndim=len(self.axes)), f)
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True) -> 'DecisionTable':
+        '''Load a saved table, memory-mapped read-only by default.
+        '''
+        with open(os.path.join(path, 'meta.json')) as f:
+            meta = json.load(f)
+        mode = 'r' if mmap else None
+        axes = [np.load(os.path.join(path, f'axis_{i}.npy')) for i in range(meta['ndim'])]
+        values = np.load(os.path.join(path, 'values.npy'), mmap_mode=mode)
+        return cls(axes, values, meta)
+
+    def _nearest(self, axis: np.ndarray, x: np.ndarray) -> np.ndarray:
+        i = np.clip(np.searchsorted(axis, x), 1, len(axis) - 1)
+        return np.where(np.abs(x - axis[i - 1]) <= np.abs(axis[i] - x), i - 1, i)
+
+    def _bracket(self, axis: np.ndarray, x: np.ndarray):
+        x = np.clip(x, axis[0], axis[-1])
+        i = np.clip(np.searchsorted(axis, x, side='right'), 1, len(axis) - 1)
+        w = (x - axis[i - 1]) / (axis[i] - axis[i - 1])
+        return i - 1, w
+
+    def lookup(self, x, y, interpolate: bool = False) -> np.ndarray:
+        '''Table value at the points (x, y); coordinates outside the grid are clamped.
+        ---
+        params:
+            x, y: coordinates on axes 0 and 1, scalars or arrays
+            interpolate: bilinear interpolation instead of the nearest grid point
+        '''
+        x = np.asarray(x, dtype=np.float64)
+        y = np.asarray(y, dtype=np.float64)
+        if not interpolate:
+            return self.values[self._nearest(self.axes[0], x), self._nearest(self.axes[1], y)]
+        i, wx = self._bracket(self.axes[0], x)
+        j, wy = self._bracket(self.axes[1], y)
+        v = self.values
+        return ((1 - wx) * (1 - wy) * v[i, j] + wx * (1 - wy) * v[i + 1, j]
+                + (1 - wx) * wy * v[i, j + 1] + wx * wy * v[i + 1, j + 1])
+
+
+def build_nbinom_table(alpha_axis: np.ndarray = NBINOM_ALPHA_AXIS, beta_axis: np.ndarray = NBINOM_BETA_AXIS, nbin_r: int = 1) -> DecisionTable:
+    '''Posterior predictive mean of NegativeBinomial over an (alpha, beta) grid.
+    '''
+    a, b = np.meshgrid(alpha_axis, beta_axis, indexing='ij')
+    store = NegativeBinomialStore(capacity=a.size)
+    store.add(PRIOR_BETA_MU, PRIOR_BETA_VAR, nbin_r=nbin_r, n=a.size)
+    store.alpha_posterior[:a.size] = a.ravel()
+    store.beta_posterior[:a.size] = b.ravel()
+    values = store.ppmean().reshape(a.shape).astype(np.float32)
+    return DecisionTable([alpha_axis, beta_axis], values, {'policy': 'optim-nbinomial', 'nbin_r': nbin_r})
+
+
+def _exp_frequency(opt: OptimExp, t_diff: float, m_init: float) -> float:
+    init_ts = T0
+    try:
+        return float(opt.frequency(opt.freq_split, init_ts + dt.timedelta(minutes=m_init),
+                                   init_ts + dt.timedelta(minutes=t_diff), init_ts))
+    except (ZeroDivisionError, ValueError, IndexError):
+        return np.nan
+
+
+def build_exp_table(is_decay: bool = False, freq_split: int = FREQ_SPLIT, t_diff_axis: np.ndarray = EXP_T_DIFF_AXIS, m_init_axis: np.ndarray = EXP_M_INIT_AXIS) -> DecisionTable:
+    '''OptimExp callback minutes over a (minutes from start to deadline, minutes since start) grid.
+    '''
+    opt = OptimExp(is_decay=is_decay, freq_split=freq_split)
+    values = np.array([[_exp_frequency(opt, t, m) for m in m_init_axis] for t in t_diff_axis], dtype=np.float32)
+    return DecisionTable([t_diff_axis, m_init_axis], values,
+                         {'policy': 'optim-exp', 'is_decay': is_decay, 'freq_split': freq_split})
+
+
+class TableNegativeBinomial(NegativeBinomial):
+    def __init__(self, table: DecisionTable, interpolate: bool = False, **kwargs) -> None:
+        super().__init__(**kwargs)
+        self.table = table
+        self.interpolate = interpolate
+
+    def ppmean(self) -> float:
+        '''Posterior predictive mean read from the table.
+        '''
+        return float(self.table.lookup(self.alpha_posterior, self.beta_posterior, self.interpolate))
+
+
+class OptimNegBinomLookup(OptimNegBinom):
+    def __init__(self, table: DecisionTable, prior_beta_mu: float = PRIOR_BETA_MU, prior_beta_var: float = PRIOR_BETA_VAR, interpolate: bool = True):
+        self.nbin = TableNegativeBinomial(
+            table,
+            interpolate=interpolate,
+            prior_beta_mu=prior_beta_mu,
+            prior_beta_var=prior_beta_var,
+            nbin_r=table.meta.get('nbin_r', 1))
+
+    def __repr__(self):
+        return 'Agent Negative Binomial (lookup)'
+
+
+class OptimExpLookup(OptimExp):
+    def __init__(self, table: DecisionTable, interpolate: bool = True) -> None:
+        super().__init__(is_decay=table.meta.get('is_decay', False), freq_split=table.meta.get('freq_split', FREQ_SPLIT))
+        self.table = table
+        self.interpolate = interpolate
+
+    def __repr__(self) -> str:
+        return super().__repr__() + ' (lookup)'
+
+    def frequency(self, freq_split: int, now_ts: dt.datetime, deadline_ts: dt.datetime, init_ts: dt.datetime) -> int:
+        '''Callback minutes read from the table.
+        '''
+        t_diff, _ = divmod((deadline_ts - init_ts).total_seconds(), 60)
+        m_to_dead, _ = divmod((deadline_ts - now_ts).total_seconds(), 60)
+        m_init, _ = divmod((now_ts - init_ts).total_seconds(), 60)
+        callback = self.table.lookup(t_diff, m_init, self.interpolate)
+        if np.isnan(callback):
+            return int(m_to_dead - 1)
+        return min(m_to_dead - 1, round(float(callback)))
+
+
+def accuracy_report(table: DecisionTable, n: int = 2000, seed: int = 0) -> Dict[str, float]:
+    '''Compare the table against the live model on random points inside the grid.
+    ---
+    params:
+        table: optim-nbinomial or optim-exp table
+        n: number of points
+        seed: sampler seed
+    returns:
+        exact decision match rate, absolute and relative errors, for nearest and interpolated lookups
+    '''
+    rng = np.random.default_rng(seed)
+    x = np.exp(rng.uniform(*np.log(table.axes[0][[0, -1]]), size=n))
+    if table.meta['policy'] == 'optim-nbinomial':
+        y = np.exp(rng.uniform(*np.log(table.axes[1][[0, -1]]), size=n))
+        models = [NegativeBinomial(nbin_r=table.meta['nbin_r']) for _ in range(n)]
+        for m, a, b in zip(models, x, y):
+            m.alpha_posterior, m.beta_posterior = a, b
+        live = np.array([m.ppmean() for m in models])
+    else:
+        y = np.round(rng.uniform(table.axes[1][0], np.minimum(x, table.axes[1][-1])))
+        x = np.round(x)
+        opt = OptimExp(is_decay=table.meta['is_decay'], freq_split=table.meta['freq_split'])
+        live = np.array([_exp_frequency(opt, a, b) for a, b in zip(x, y)])
+    out = {'points': n}
+    for name, interpolate in (('nearest', False), ('interpolated', True)):
+        approx = table.lookup(x, y, interpolate)
+        ok = np.isfinite(live) & np.isfinite(approx)
+        err = np.abs(approx[ok] - live[ok])
+        out[f'{name}_match'] = float(np.mean(np.round(approx[ok]) == np.round(live[ok])))
+        out[f'{name}_mae'] = float(err.mean())
+        out[f'{name}_median_rel_err'] = float(np.median(err / np.maximum(np.abs(live[ok]), 1)))
+        out[f'{name}_max_err'] = float(err.max())
+    return out
+
+
+tables: Dict[str, DecisionTable] = {}
+
+
+def load_tables(path: str) -> Dict[str, DecisionTable]:
+    '''Load the exported tables of a directory into the module registry, memory-mapped.
+    '''
+    for name in ('optim-nbinomial', 'optim-exp'):
+        table_path = os.path.join(path, name)
+        if os.path.exists(os.path.join(table_path, 'meta.json')):
+            tables[name] = DecisionTable.load(table_path)
+    return tables
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Export or check the optimizer decision tables.")
+    parser.add_argument('command', choices=['export', 'report'])
+    parser.add_argument('path')
+    parser.add_argument('--decay', action='store_true', help='OptimExp with decay')
+    parser.add_argument('--freq-split', type=int, default=FREQ_SPLIT)
+    args = parser.parse_args(argv)
+    if args.command == 'export':
+        build_nbinom_table().save(os.path.join(args.path, 'optim-nbinomial'))
+        build_exp_table(is_decay=args.decay, freq_split=args.freq_split).save(os.path.join(args.path, 'optim-exp'))
+    report = {name: accuracy_report(table) for name, table in load_tables(args.path).items()}
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
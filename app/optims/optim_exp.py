@@ -7,10 +7,12 @@ import numpy as np
 from .homework import Optim
 from .utils import DataImpactSerializer
 
+FREQ_SPLIT = 18
 
 class OptimExp(Optim, DataImpactSerializer):
-    def __init__(self, is_decay: bool = False) -> None:
+    def __init__(self, is_decay: bool = False, freq_split: int = FREQ_SPLIT) -> None:
         self.is_decay = is_decay
+        self.freq_split = freq_split
 
     def __repr__(self) -> str:
         decay_str = 'Decay' if self.is_decay else 'not Decay'
@@ -122,7 +124,7 @@ class OptimExp(Optim, DataImpactSerializer):
 
         total_pool = super().get_total_pool(num_remaining_in_pool, impacted_candidates_data)
         init_ts = super().get_init_ts(now, impacted_candidates_data)
-        freq_split = 18
+        freq_split = self.freq_split
 
         callback_time_minutes = self.frequency(freq_split, now, deadline, init_ts)
         num_candidates_needed = self.severity(total_pool, freq_split)
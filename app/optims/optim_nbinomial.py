@@ -4,17 +4,17 @@ from typing import Any, Dict, List, Optional, Tuple
 import datetime as dt
 
 from .homework import Optim, NegativeBinomial
-from .utils import DataImpactSerializer
+from .utils import DataImpactSerializer, ImpactAggregate
 
 PRIOR_BETA_MU = 0.04
 PRIOR_BETA_VAR = 0.00014
 
 
 class OptimNegBinom(Optim, DataImpactSerializer):
-    def __init__(self):
+    def __init__(self, prior_beta_mu: float = PRIOR_BETA_MU, prior_beta_var: float = PRIOR_BETA_VAR):
         self.nbin = NegativeBinomial(
-            prior_beta_mu=PRIOR_BETA_MU,
-            prior_beta_var=PRIOR_BETA_VAR,
+            prior_beta_mu=prior_beta_mu,
+            prior_beta_var=prior_beta_var,
             nbin_r=1)
 
     def __repr__(self):
@@ -56,3 +56,45 @@ class OptimNegBinom(Optim, DataImpactSerializer):
         callback_time_minutes, _ = super().get_avg_t_response_accepted(impacted_candidates_data, 7)
 
         return finished, min(num_candidates_needed, num_remaining_in_pool), round(callback_time_minutes)
+
+    def invitation_logic_batch(self, requests: List[dict]) -> List[Tuple[bool, int, Optional[int]]]:
+        '''Vectorized invitation_logic_api over a batch, same decisions as the loop.
+        Each impact list is folded once into an ImpactAggregate instead of one DataFrame
+        per statistic, and the posterior mean is computed once for the batch unless a
+        request updates it; then it is recomputed after each update, in request order.
+        ---
+        params:
+            requests: list of invitation_logic_api keyword arguments
+        returns:
+            list of (finished, num_candidates_needed, callback_time_minutes)
+        '''
+        if not requests:
+            return []
+        aggs = [
+            r['impacted_candidates_data'] if isinstance(r['impacted_candidates_data'], ImpactAggregate)
+            else ImpactAggregate.from_list(r['impacted_candidates_data']) for r in requests
+        ]
+        posts = [self.get_n_first_accepted(agg) for agg in aggs]
+        if any(post > 0 for post in posts):
+            means = []
+            for post in posts:
+                if post > 0:
+                    self.nbin.update(post)
+                means.append(self.nbin.ppmean())
+        else:
+            means = [self.nbin.ppmean()] * len(requests)
+
+        finished = np.array([r['now'] >= r['deadline'] for r in requests])
+        vacancies = np.array([r['num_vacancies'] for r in requests])
+        pools = np.array([r['num_remaining_in_pool'] for r in requests])
+        accepted = np.array([self.get_total_contract_accepted(agg) for agg in aggs])
+        done = finished | (vacancies - accepted <= 0) | (pools <= 0)
+
+        out = []
+        for i in range(len(requests)):
+            if done[i]:
+                out.append((True, 0, 0))
+                continue
+            callback_time_minutes, _ = self.get_avg_t_response_accepted(aggs[i], 7)
+            out.append((bool(finished[i]), min(round(means[i]), int(pools[i])), round(callback_time_minutes)))
+        return out
@@ -0,0 +1,178 @@
+"""
+Joint allocation of invitations across openings that draw from shared candidate pools.
+
+OptimStochConstraint solves every opening on its own, with x <= num_remaining_in_pool.
+When openings share candidates, the invitations of all of them must also fit in every
+shared pool. The portfolio solves one LP per tick:
+
+    max  sum_j (PROFIT_VACANCY * p_j - COST_SPAM) * x_j
+    s.t. x_j <= num_remaining_in_pool_j
+         p_j * x_j <= num_remaining_vacancies_j
+         sum_{j in pool k} x_j <= capacity_k      (sparse, one row per shared pool)
+         x_j >= 0
+
+and rounds the solution down. Without shared pools the LP separates and is solved in
+closed form, vectorized.
+
+    python -m app.optims.optim_portfolio     # scaling benchmark, 10 to 10,000 openings
+"""
+
+import time
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+from scipy import sparse
+from scipy.optimize import linprog
+
+from .homework import NegativeBinomial
+from .economics import COST_SPAM, PROFIT_VACANCY
+from .utils import DataImpactSerializer
+
+
+def pool_matrix(pools: Sequence[Sequence[int]], n_openings: int) -> sparse.csr_matrix:
+    '''Sparse membership matrix of the shared pools.
+    ---
+    params:
+        pools: for every shared pool, the indexes of the openings drawing from it
+        n_openings: number of openings
+    returns:
+        (n pools, n openings) 0/1 matrix
+    '''
+    rows = np.repeat(np.arange(len(pools)), [len(p) for p in pools])
+    cols = np.fromiter((j for p in pools for j in p), dtype=np.int64, count=len(rows))
+    return sparse.csr_matrix((np.ones(len(rows)), (rows, cols)), shape=(len(pools), n_openings))
+
+
+class OptimPortfolio(DataImpactSerializer):
+    def __init__(self, beta_mean: float = 0.2, beta_var: float = 0.001, profit_vacancy: float = PROFIT_VACANCY, cost_spam: float = COST_SPAM) -> None:
+        '''
+        ---
+        params:
+            beta_mean, beta_var: Beta prior of the acceptance rate, as in OptimStochConstraint
+            profit_vacancy: profit of a filled vacancy
+            cost_spam: cost of an invitation
+        '''
+        self.beta_mean = beta_mean
+        self.beta_var = beta_var
+        self.alpha_prior, self.beta_prior = NegativeBinomial.est_prior_beta_params(beta_mean, beta_var)
+        self.profit_vacancy = profit_vacancy
+        self.cost_spam = cost_spam
+        self.last_status = None
+
+    def __repr__(self):
+        return 'Agent Portfolio'
+
+    def allocate(
+        self,
+        p: np.ndarray,
+        num_remaining_vacancies: np.ndarray,
+        num_remaining_in_pool: np.ndarray,
+        pools: Optional[sparse.spmatrix] = None,
+        pool_capacity: Optional[np.ndarray] = None
+    ) -> np.ndarray:
+        '''Invitations per opening maximizing the expected profit of the batch.
+        ---
+        params:
+            p: acceptance rate per opening
+            num_remaining_vacancies: vacancies still open per opening
+            num_remaining_in_pool: own remaining pool per opening
+            pools: (n pools, n openings) membership matrix of the shared pools, see pool_matrix
+            pool_capacity: candidates left in every shared pool
+        returns:
+            x: integer invitations per opening
+        '''
+        p = np.asarray(p, dtype=np.float64)
+        margin = self.profit_vacancy * p - self.cost_spam
+        with np.errstate(divide='ignore'):
+            upper = np.minimum(np.asarray(num_remaining_in_pool, dtype=np.float64),
+                               np.where(p > 0, np.asarray(num_remaining_vacancies) / p, 0))
+        upper = np.maximum(upper, 0)
+        if pools is None or pools.shape[0] == 0:
+            self.last_status = 'closed-form'
+            return np.floor(np.where(margin > 0, upper, 0)).astype(np.int64)
+
+        res = linprog(
+            -margin,
+            A_ub=sparse.csr_matrix(pools),
+            b_ub=np.asarray(pool_capacity, dtype=np.float64),
+            bounds=np.column_stack([np.zeros_like(upper), upper]),
+            method='highs',
+        )
+        self.last_status = res.message
+        if res.x is None:
+            raise ValueError(f"Portfolio LP failed: {res.message}")
+        return np.floor(res.x + 1e-9).astype(np.int64)
+
+    def posterior_p(self, impacted_candidates_data: list) -> float:
+        '''Posterior mean of the acceptance rate of one opening: conjugate Beta update
+        of the prior with the offers accepted out of the candidates impacted.
+        '''
+        n_impacted = len(impacted_candidates_data)
+        n_accepted = super().get_total_contract_accepted(impacted_candidates_data)
+        return float((self.alpha_prior + n_accepted) / (self.alpha_prior + self.beta_prior + n_impacted))
+
+    def invitation_logic_portfolio(self, openings: List[dict], pools: Sequence[Sequence[int]] = (), pool_capacity: Sequence[int] = ()) -> List[Tuple[bool, int, int]]:
+        '''Decide a batch of openings in one solve.
+        ---
+        params:
+            openings: invitation_logic_api keyword arguments per opening
+            pools: opening indexes of every shared pool
+            pool_capacity: candidates left in every shared pool
+        returns:
+            list of (finished, num_candidates_needed, callback_time_minutes)
+        '''
+        n = len(openings)
+        p = np.zeros(n)
+        vacancies = np.zeros(n)
+        remaining = np.zeros(n)
+        finished = np.zeros(n, dtype=bool)
+        callbacks = np.zeros(n, dtype=np.int64)
+        for j, o in enumerate(openings):
+            impacts = o['impacted_candidates_data']
+            vacancies[j] = o['num_vacancies'] - super().get_total_contract_accepted(impacts)
+            remaining[j] = o['num_remaining_in_pool']
+            finished[j] = (o['now'] >= o['deadline']) | (vacancies[j] <= 0) | (remaining[j] <= 0)
+            if not finished[j]:
+                p[j] = self.posterior_p(impacts)
+                callback, _ = super().get_avg_t_response_accepted(impacts, 7)
+                callbacks[j] = max(5, round(callback))
+        remaining[finished] = 0
+        x = self.allocate(p, vacancies, remaining,
+                          pool_matrix(pools, n) if len(pools) else None, pool_capacity)
+        return [(True, 0, 0) if finished[j] else (False, int(x[j]), int(callbacks[j])) for j in range(n)]
+
+
+def benchmark(sizes: Sequence[int] = (10, 100, 1000, 10000), seed: int = 0) -> List[dict]:
+    '''Time the joint solve for growing batches of openings with overlapping pools.
+    Every opening draws from 1 to 3 of n/5 shared pools.
+    '''
+    rng = np.random.default_rng(seed)
+    out = []
+    opt = OptimPortfolio()
+    for n in sizes:
+        n_pools = max(1, n // 5)
+        pools = [[] for _ in range(n_pools)]
+        for j in range(n):
+            for k in rng.choice(n_pools, size=min(n_pools, rng.integers(1, 4)), replace=False):
+                pools[k].append(j)
+        p = rng.beta(8, 40, size=n)
+        vacancies = rng.integers(1, 10, size=n)
+        remaining = rng.integers(50, 500, size=n)
+        # pools can serve half of what their openings would invite on their own
+        capacity = np.array([0.5 * np.minimum(remaining, vacancies / p)[pool].sum() for pool in pools])
+
+        t0 = time.perf_counter()
+        x = opt.allocate(p, vacancies, remaining, pool_matrix(pools, n), capacity)
+        joint = time.perf_counter() - t0
+        status = opt.last_status
+        t0 = time.perf_counter()
+        x_separate = opt.allocate(p, vacancies, remaining)
+        separate = time.perf_counter() - t0
+        out.append({'openings': n, 'pools': n_pools, 'joint_s': joint, 'no_overlap_closed_form_s': separate,
+                    'invitations': int(x.sum()), 'invitations_no_overlap': int(x_separate.sum()), 'status': status})
+    return out
+
+
+if __name__ == '__main__':
+    for row in benchmark():
+        print(row)
@@ -8,9 +8,7 @@ import random
 
 from .homework import Optim, NegativeBinomial
 from .utils import DataImpactSerializer
-
-PROFIT_VACANCY = 2500
-COST_SPAM = 20
+from .economics import COST_SPAM, PROFIT_VACANCY
 SOLVER = 'glpk'
 
 
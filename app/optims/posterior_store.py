@@ -0,0 +1,165 @@
+from typing import Optional, Sequence, Union
+
+import numpy as np
+from scipy import special
+
+from .homework import NegativeBinomial
+
+Index = Optional[Union[int, Sequence[int], np.ndarray, slice]]
+
+
+class NegativeBinomialStore():
+    def __init__(self, capacity: int = 1024) -> None:
+        '''Beta-NegativeBinomial posteriors of many openings kept as contiguous arrays,
+        24 bytes per opening. Same model as NegativeBinomial, with every method working
+        on all the openings, or an index selection, in one call.
+        ---
+        params:
+            capacity: initial number of openings, grown on demand
+        '''
+        self.size = 0
+        self.alpha_posterior = np.empty(capacity, dtype=np.float64)
+        self.beta_posterior = np.empty(capacity, dtype=np.float64)
+        self.nbin_r = np.empty(capacity, dtype=np.int32)
+        self.n_samples = np.empty(capacity, dtype=np.int32)
+
+    def __len__(self) -> int:
+        return self.size
+
+    @property
+    def nbytes_per_opening(self) -> int:
+        return (self.alpha_posterior.itemsize + self.beta_posterior.itemsize
+                + self.nbin_r.itemsize + self.n_samples.itemsize)
+
+    def _reserve(self, n: int) -> None:
+        capacity = len(self.alpha_posterior)
+        if self.size + n <= capacity:
+            return
+        new_capacity = max(2 * capacity, self.size + n)
+        for name in ('alpha_posterior', 'beta_posterior', 'nbin_r', 'n_samples'):
+            old = getattr(self, name)
+            arr = np.empty(new_capacity, dtype=old.dtype)
+            arr[:self.size] = old[:self.size]
+            setattr(self, name, arr)
+
+    def add(self, prior_beta_mu: float, prior_beta_var: float, nbin_r: int = 1, n: int = 1) -> np.ndarray:
+        '''Open n new openings from the same Beta prior.
+        ---
+        params:
+            prior_beta_mu: prior mean of the success probability
+            prior_beta_var: prior variance of the success probability
+            nbin_r: number of successes of the negative binomial
+            n: number of openings
+        returns:
+            idx: indexes of the new openings
+        '''
+        alpha, beta = NegativeBinomial.est_prior_beta_params(prior_beta_mu, prior_beta_var)
+        self._reserve(n)
+        idx = np.arange(self.size, self.size + n)
+        self.alpha_posterior[idx] = alpha
+        self.beta_posterior[idx] = beta
+        self.nbin_r[idx] = nbin_r
+        self.n_samples[idx] = 0
+        self.size += n
+        return idx
+
+    @classmethod
+    def from_models(cls, models: Sequence[NegativeBinomial]) -> 'NegativeBinomialStore':
+        '''Pack existing NegativeBinomial posteriors into a store.
+        '''
+        store = cls(capacity=max(len(models), 1))
+        store.size = len(models)
+        store.alpha_posterior[:store.size] = [m.alpha_posterior for m in models]
+        store.beta_posterior[:store.size] = [m.beta_posterior for m in models]
+        store.nbin_r[:store.size] = [m.nbin_r for m in models]
+        store.n_samples[:store.size] = [m.n_samples for m in models]
+        return store
+
+    def to_model(self, i: int) -> NegativeBinomial:
+        '''Unpack one opening as a NegativeBinomial instance.
+        '''
+        model = NegativeBinomial(nbin_r=int(self.nbin_r[i]))
+        model.alpha_posterior = float(self.alpha_posterior[i])
+        model.beta_posterior = float(self.beta_posterior[i])
+        model.n_samples = int(self.n_samples[i])
+        return model
+
+    def _idx(self, idx: Index):
+        return slice(0, self.size) if idx is None else idx
+
+    def update(self, idx: Union[int, Sequence[int], np.ndarray], data_sum, n_obs=1) -> None:
+        '''Batched posterior update, NegativeBinomial.update for every selected opening.
+        Repeated indexes accumulate.
+        ---
+        params:
+            idx: openings updated
+            data_sum: sum of the observed failures, per index
+            n_obs: number of observations, per index
+        '''
+        idx = np.atleast_1d(np.asarray(idx))
+        n_obs = np.broadcast_to(np.asarray(n_obs), idx.shape)
+        data_sum = np.broadcast_to(np.asarray(data_sum, dtype=np.float64), idx.shape)
+        if 8 * len(idx) >= self.size:
+            # dense batch: one pass over the whole store beats the unbuffered np.add.at
+            n = self.size
+            self.alpha_posterior[:n] += np.bincount(idx, weights=self.nbin_r[idx] * n_obs, minlength=n)
+            self.beta_posterior[:n] += np.bincount(idx, weights=data_sum, minlength=n)
+            self.n_samples[:n] += np.bincount(idx, weights=n_obs, minlength=n).astype(np.int32)
+        else:
+            np.add.at(self.alpha_posterior, idx, self.nbin_r[idx] * n_obs)
+            np.add.at(self.beta_posterior, idx, data_sum)
+            np.add.at(self.n_samples, idx, n_obs)
+
+    def ppmean(self, idx: Index = None) -> np.ndarray:
+        '''Posterior predictive mean, nan where alpha <= 1.
+        ---
+        params:
+            idx: openings, None for all
+        '''
+        sel = self._idx(idx)
+        a = self.alpha_posterior[sel]
+        b = self.beta_posterior[sel]
+        r = self.nbin_r[sel]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(a > 1, r * b / (a - 1), np.nan)
+
+    def pppdf(self, x, idx: Index = None) -> np.ndarray:
+        '''Posterior predictive probability mass of every selected opening at the quantiles x.
+        ---
+        params:
+            x: quantiles
+            idx: openings, None for all
+        returns:
+            pdf: array (n openings, len(x))
+        '''
+        sel = self._idx(idx)
+        a = np.atleast_1d(self.alpha_posterior[sel])[:, None]
+        b = np.atleast_1d(self.beta_posterior[sel])[:, None]
+        r = np.atleast_1d(self.nbin_r[sel]).astype(np.float64)[:, None]
+        k = np.floor(np.atleast_1d(np.asarray(x, dtype=np.float64)))[None, :]
+        valid = k >= 0
+        k = np.where(valid, k, 0)
+        logcomb = special.gammaln(r + k) - special.gammaln(k + 1) - special.gammaln(r)
+        logbeta = special.betaln(a + r, b + k) - special.betaln(a, b)
+        return np.where(valid, np.exp(logcomb + logbeta), 0.0)
+
+    def rvs(self, idx: Index = None, random_state: Optional[np.random.Generator] = None) -> np.ndarray:
+        '''One draw of the Beta posterior per selected opening.
+        ---
+        params:
+            idx: openings, None for all
+            random_state: numpy Generator, or seed
+        '''
+        rng = np.random.default_rng(random_state)
+        sel = self._idx(idx)
+        return rng.beta(self.alpha_posterior[sel], self.beta_posterior[sel])
+
+    def num_candidates_needed(self, num_remaining_in_pool, idx: Index = None) -> np.ndarray:
+        '''OptimNegBinom invitation rule, round(ppmean) capped by the remaining pool.
+        ---
+        params:
+            num_remaining_in_pool: remaining pool per selected opening
+            idx: openings, None for all
+        '''
+        mean = np.nan_to_num(self.ppmean(idx), nan=0.0)
+        return np.minimum(np.round(mean), num_remaining_in_pool).astype(np.int64)
@@ -0,0 +1,191 @@
+"""
+Empirical-Bayes refresh of the Beta prior used by OptimNegBinom and OptimStochConstraint.
+
+An offline job reads the final request of completed openings (from the `log` file or
+a JSONL capture), estimates the spread of the offer acceptance rate across openings and
+writes the prior atomically to a JSON file. API workers watch that file from a
+background thread and swap the new prior in; nothing is fitted on the request path.
+
+    python -m app.optims.prior_refresh log --out priors.json --every 3600
+"""
+
+import argparse
+import datetime as dt
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import namedtuple
+from typing import Iterable, Optional
+
+import numpy as np
+
+from .homework import NegativeBinomial
+
+Prior = namedtuple('Prior', ['mu', 'var', 'alpha', 'beta', 'n_openings'])
+
+MIN_OPENINGS = 20
+
+logger = logging.getLogger(__name__)
+
+
+def _ts(value) -> dt.datetime:
+    return value if isinstance(value, dt.datetime) else dt.datetime.fromisoformat(str(value))
+
+
+def opening_outcome(payload: dict) -> Optional[tuple]:
+    '''Outcome of an opening from its final request, or None while it is still running.
+    ---
+    params:
+        payload: ModelParams-like dict
+    returns:
+        (candidates impacted, offers accepted)
+    '''
+    impacts = payload['impacted_candidates_data']
+    accepted = sum(1 for i in impacts if i.get('candidate_status') == 'offer_accepted')
+    finished = (
+        _ts(payload['now']) >= _ts(payload['deadline'])
+        or payload['num_remaining_in_pool'] <= 0
+        or accepted >= payload['num_vacancies']
+    )
+    if not finished or not impacts:
+        return None
+    return len(impacts), accepted
+
+
+def estimate_prior(outcomes: Iterable[tuple]) -> Optional[Prior]:
+    '''Method of moments Beta prior of the per opening acceptance rate, with the
+    binomial sampling noise removed from the observed variance.
+    ---
+    params:
+        outcomes: (candidates impacted, offers accepted) per completed opening
+    returns:
+        Prior, or None with less than MIN_OPENINGS openings
+    '''
+    data = np.asarray(list(outcomes), dtype=np.float64).reshape(-1, 2)
+    if len(data) < MIN_OPENINGS:
+        return None
+    n, k = data[:, 0], data[:, 1]
+    mu = k.sum() / n.sum()
+    mu = float(np.clip(mu, 1e-4, 1 - 1e-4))
+    var = np.var(k / n, ddof=1) - np.mean(mu * (1 - mu) / n)
+    var = float(np.clip(var, 1e-3 * mu * (1 - mu), 0.5 * mu * (1 - mu)))
+    alpha, beta = NegativeBinomial.est_prior_beta_params(mu, var)
+    return Prior(mu, var, alpha, beta, len(data))
+
+
+def write_prior(prior: Prior, path: str) -> None:
+    '''Write atomically: readers see the old file or the new one, never a partial one.
+    '''
+    doc = dict(prior._asdict(), updated_at=dt.datetime.utcnow().isoformat())
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix='.tmp')
+    with os.fdopen(fd, 'w') as f:
+        json.dump(doc, f)
+    os.replace(tmp, path)
+
+
+def read_prior(path: str) -> Prior:
+    with open(path) as f:
+        doc = json.load(f)
+    return Prior(*(doc[field] for field in Prior._fields))
+
+
+def refresh(captures: Iterable[str], out_path: str) -> Optional[Prior]:
+    '''One run of the aggregation job.
+    ---
+    params:
+        captures: log or JSONL files with the requests
+        out_path: priors JSON file
+    returns:
+        the prior written, None if there was not enough data
+    '''
+    from app.scenarios_generator.replay import iter_requests
+
+    outcomes = (o for path in captures for o in map(opening_outcome, iter_requests(path)) if o is not None)
+    prior = estimate_prior(outcomes)
+    if prior is not None:
+        write_prior(prior, out_path)
+    return prior
+
+
+class PriorHolder():
+    def __init__(self) -> None:
+        '''Current learned prior of a worker. Swapping the reference is atomic, so request
+        threads read either the old or the new prior without locking.
+        '''
+        self.prior = None
+        self.mtime = None
+
+    def current(self) -> Optional[Prior]:
+        return self.prior
+
+    def swap(self, prior: Optional[Prior]) -> None:
+        self.prior = prior
+
+    def check(self, path: str) -> bool:
+        '''Reload the prior if the file changed since the last check.
+        ---
+        returns:
+            True if a new prior was swapped in
+        '''
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except FileNotFoundError:
+            return False
+        if mtime == self.mtime:
+            return False
+        prior = read_prior(path)
+        self.mtime = mtime
+        self.swap(prior)
+        return True
+
+    def load(self, path: str) -> bool:
+        '''check() for the startup paths: a missing, unreadable or malformed file is
+        logged and the optimizers keep their constant priors.
+        ---
+        returns:
+            True if a new prior was swapped in
+        '''
+        try:
+            return self.check(path)
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Ignoring priors file {path}: {e!r}")
+            return False
+
+    def watch(self, path: str, interval: float = 30) -> threading.Thread:
+        '''Poll the priors file from a daemon thread.
+        '''
+        def _loop():
+            while True:
+                try:
+                    self.check(path)
+                except (OSError, ValueError, KeyError):
+                    pass
+                time.sleep(interval)
+
+        thread = threading.Thread(target=_loop, name='prior-watcher', daemon=True)
+        thread.start()
+        return thread
+
+
+priors = PriorHolder()
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Re-estimate the optimizers Beta prior from completed openings.")
+    parser.add_argument('captures', nargs='+', help='log or JSONL files')
+    parser.add_argument('--out', default='priors.json')
+    parser.add_argument('--every', type=float, default=None, help='seconds between runs; once if omitted')
+    args = parser.parse_args(argv)
+    while True:
+        prior = refresh(args.captures, args.out)
+        print(json.dumps(prior._asdict() if prior else None))
+        if not args.every:
+            break
+        time.sleep(args.every)
+
+
+if __name__ == '__main__':
+    main()
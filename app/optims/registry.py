@@ -0,0 +1,74 @@
+from typing import Callable, Dict, Optional
+
+from .homework import Optim
+from .optim_exp import OptimExp
+from .optim_nbinomial import OptimNegBinom
+from .optim_portfolio import OptimPortfolio
+from .optim_stoch_constraint import OptimStochConstraint
+from .prior_refresh import priors
+
+
+def optim_exp() -> OptimExp:
+    return OptimExp(is_decay=False)
+
+
+def optim_nbinomial() -> OptimNegBinom:
+    prior = priors.current()
+    kwargs = {} if prior is None else {"prior_beta_mu": prior.mu, "prior_beta_var": prior.var}
+    return OptimNegBinom(**kwargs)
+
+
+def optim_stoch_constraint() -> OptimStochConstraint:
+    prior = priors.current()
+    if prior is None:
+        return OptimStochConstraint(beta_mean=0.2, beta_var=0.001)
+    return OptimStochConstraint(beta_mean=prior.mu, beta_var=prior.var)
+
+
+def optim_portfolio() -> OptimPortfolio:
+    prior = priors.current()
+    if prior is None:
+        return OptimPortfolio(beta_mean=0.2, beta_var=0.001)
+    return OptimPortfolio(beta_mean=prior.mu, beta_var=prior.var)
+
+
+# Route name -> optimizer factory, with the same arguments the API routes use.
+# The Beta priors come from the learned prior once the worker has loaded one.
+OPTIMIZERS: Dict[str, Callable[[], Optim]] = {
+    "optim-exp": optim_exp,
+    "optim-nbinomial": optim_nbinomial,
+    "optim-stoch-constraint": optim_stoch_constraint,
+}
+
+
+# Route name -> optimizer class, to build variants with other constructor kwargs
+# (parameter sweeps, shadow candidates)
+OPTIMIZER_CLASSES: Dict[str, type] = {
+    "optim-exp": OptimExp,
+    "optim-nbinomial": OptimNegBinom,
+    "optim-stoch-constraint": OptimStochConstraint,
+}
+
+
+def get_optimizer(name: str) -> Optim:
+    '''Build a fresh optimizer instance for a route name.
+    ---
+    params:
+        name: route name, e.g. optim-nbinomial
+    returns:
+        optimizer instance
+    '''
+    try:
+        return OPTIMIZERS[name]()
+    except KeyError:
+        raise ValueError(f"Unknown optimizer '{name}'. Available: {sorted(OPTIMIZERS)}")
+
+
+def build_optimizer(name: str, params: Optional[dict] = None) -> Optim:
+    '''Route optimizer when params is None, else its class built with params.
+    '''
+    if params is None:
+        return get_optimizer(name)
+    if name not in OPTIMIZER_CLASSES:
+        raise ValueError(f"Unknown optimizer '{name}'. Available: {sorted(OPTIMIZER_CLASSES)}")
+    return OPTIMIZER_CLASSES[name](**params)
@@ -1,6 +1,84 @@
 import datetime as dt
+from collections import Counter
+import numpy as np
 import pandas as pd
 
+
+class ImpactAggregate():
+    def __init__(self) -> None:
+        '''Running aggregates of an impacted_candidates_data list, folded record by record,
+        so large pools never materialize the list. Only the response minutes of the
+        accepted notifications are kept, as OptimStochConstraint fits their distribution.
+        '''
+        self.n = 0
+        self.notification_counts = Counter()
+        self.candidate_counts = Counter()
+        self.minutes_sum = 0
+        self.minutes_count = 0
+        self.minutes_max = None
+        self.accepted_minutes = []
+
+    def __len__(self) -> int:
+        return self.n
+
+    def add(self, impact: dict) -> None:
+        '''Fold one impact record.
+        ---
+        params:
+            impact: dict with notification_status, candidate_status, time_to_respond_ir_minutes
+        '''
+        self.n += 1
+        status = impact.get('notification_status')
+        self.notification_counts[status] += 1
+        self.candidate_counts[impact.get('candidate_status')] += 1
+        mins = impact.get('time_to_respond_ir_minutes')
+        if mins is not None:
+            self.minutes_sum += mins
+            self.minutes_count += 1
+            self.minutes_max = mins if self.minutes_max is None else max(self.minutes_max, mins)
+            if status == 'ir_accepted':
+                self.accepted_minutes.append(mins)
+
+    @classmethod
+    def from_list(cls, impact_data: list) -> 'ImpactAggregate':
+        agg = cls()
+        for impact in impact_data:
+            agg.add(impact)
+        return agg
+
+    def summary(self) -> dict:
+        '''JSON-able aggregates, as logged by the streaming route.
+        '''
+        return {
+            'notification_counts': dict(self.notification_counts),
+            'candidate_counts': dict(self.candidate_counts),
+            'minutes_max': self.minutes_max,
+            'accepted_minutes': list(self.accepted_minutes),
+        }
+
+    @staticmethod
+    def summary_records(summary: dict) -> list:
+        '''Impact records with the aggregates of a summary: the counts per status, the
+        accepted response minutes and the max minutes. Which notification status went
+        with which candidate status is not kept, and no DataImpactSerializer stat uses it.
+        ---
+        params:
+            summary: dict returned by summary()
+        returns:
+            list of impact records
+        '''
+        accepted = summary['accepted_minutes']
+        records = [{'notification_status': 'ir_accepted', 'time_to_respond_ir_minutes': m} for m in accepted]
+        for status, count in summary['notification_counts'].items():
+            records.extend({'notification_status': status} for _ in range(count - (len(accepted) if status == 'ir_accepted' else 0)))
+        if summary['minutes_max'] is not None and max(accepted, default=None) != summary['minutes_max']:
+            records[len(accepted)]['time_to_respond_ir_minutes'] = summary['minutes_max']
+        statuses = (s for status, count in summary['candidate_counts'].items() for s in [status] * count)
+        for record, status in zip(records, statuses):
+            record['candidate_status'] = status
+        return records
+
+
 class DataImpactSerializer():
     @staticmethod
     def get_total_pool(pool: int, impact_data: list) -> int:
@@ -24,10 +102,13 @@ class DataImpactSerializer():
         returns:
             init: returns the estimated init datetime of the job opening
         '''
+        if isinstance(impact_data, ImpactAggregate):
+            max_mins = impact_data.minutes_max
+            return now if max_mins is None else now + dt.timedelta(minutes=int(max_mins))
         max_mins = pd.DataFrame(list(impact_data)).get('time_to_respond_ir_minutes')
         if max_mins is not None:
             max_mins = max_mins.max()
-            return now + dt.timedelta(minutes=max_mins)
+            return now + dt.timedelta(minutes=int(max_mins))
         else:
             return now
 
@@ -41,6 +122,9 @@ class DataImpactSerializer():
             t_def: perc of accepted in impact data
         """
         t_def = 0
+        if isinstance(impact_data, ImpactAggregate):
+            # same as the list path below, where indexing the scalar count always falls back to 0
+            return t_def
         try:
             data = pd.DataFrame(list(impact_data))
             t_def = round(data.groupby('notification_status').notification_status.count()['ir_accepted'][0]/len(impact_data)*100)
@@ -57,6 +141,8 @@ class DataImpactSerializer():
         returns:
             list of accepted response times if exist any in impact data
         """
+        if isinstance(impact_data, ImpactAggregate):
+            return np.asarray(impact_data.accepted_minutes).astype(int) if len(impact_data) else [0]
         data = pd.DataFrame(list(impact_data))
         if 'notification_status' in data.columns:
             return data[data.notification_status=='ir_accepted'].time_to_respond_ir_minutes.values.astype(int)
@@ -73,6 +159,11 @@ class DataImpactSerializer():
         returns:
             avg of response time of accepted
         """
+        if isinstance(impact_data, ImpactAggregate):
+            accepted = impact_data.accepted_minutes
+            if (len(impact_data) >= 3) & (len(accepted)):
+                return np.mean(accepted), len(accepted)
+            return default, 0
         data = pd.DataFrame(list(impact_data))
         try:
             if (data.shape[0] >= 3) & (len(data[data.notification_status == 'ir_accepted'])):
@@ -93,6 +184,8 @@ class DataImpactSerializer():
         returns:
             t_acc: count of accepted offers
         """
+        if isinstance(impact_data, ImpactAggregate):
+            return impact_data.candidate_counts['offer_accepted']
         try:
             data = pd.DataFrame(list(impact_data))
             t_acc = data[data.candidate_status == 'offer_accepted'].candidate_status.count()
@@ -0,0 +1,61 @@
+"""
+Pre-fork warm-up of the read-only state of the API.
+
+With PRELOAD_APP set, gunicorn imports the app in the master (preload_app) and app.main
+calls warm() while it is imported: the heavy modules, the learned prior and the lazy
+scipy / pyomo state are all built once, then gc.freeze() moves every
+object to the permanent generation. The workers forked afterwards share those pages
+copy-on-write, and the collector of a worker never walks them, so their reference
+counts and gc headers are not written and the pages stay shared.
+
+Nothing built here is mutated after the fork: the optimizers are still instantiated per
+request and the prior holder swaps in new Prior objects instead of editing the loaded one.
+"""
+
+import datetime as dt
+import gc
+import os
+from typing import Optional
+
+from .optims.prior_refresh import priors
+from .optims.registry import OPTIMIZERS, get_optimizer
+
+WARM_REQUEST = {
+    "now": dt.datetime(2022, 1, 1),
+    "deadline": dt.datetime(2022, 1, 2),
+    "num_vacancies": 2,
+    "num_remaining_in_pool": 100,
+    "impacted_candidates_data": [
+        {"notification_status": "ir_accepted", "candidate_status": "offer_accepted", "time_to_respond_ir_minutes": 9},
+        {"notification_status": "ir_pending", "candidate_status": "not_in_ft", "time_to_respond_ir_minutes": 7},
+    ],
+}
+
+
+def preload_enabled() -> bool:
+    return os.getenv("PRELOAD_APP", "").lower() in ("1", "true", "yes")
+
+
+def warm(priors_path: Optional[str] = None) -> dict:
+    '''Build the shared read-only state in the master, before the workers are forked.
+    ---
+    params:
+        priors_path: learned priors file, see prior_refresh
+    returns:
+        what was warmed, for the startup log
+    '''
+    out = {"prior": False, "optimizers": []}
+    if priors_path:
+        out["prior"] = priors.load(priors_path)
+    for name in OPTIMIZERS:
+        # first calls fill the scipy distribution and pyomo caches; an optimizer
+        # without its external solver is skipped
+        try:
+            get_optimizer(name).invitation_logic_api(**WARM_REQUEST)
+            out["optimizers"].append(name)
+        except Exception:
+            pass
+    gc.collect()
+    gc.freeze()
+    out["frozen_objects"] = gc.get_freeze_count()
+    return out
@@ -1,15 +1,20 @@
 import random
 import datetime
+import numpy as np
 import pandas as pd
 from typing import Any, Dict, List, Optional, Tuple
 from itertools import chain
-from numpy.random import choice
 from scipy.stats import skellam, weibull_min
 import copy
 
+from .evaluation import EvaluationReport
+
 
 ##notification prob matrix
 NOTIFICATION_STATUS = ["ir_pending", "ir_accepted", "ir_rejected"]
+# the first API call comes this many minutes after the case opens; minutes_elapsed
+# and the EventScheduler clock both count from the opening, so it is recorded at 1
+FIRST_CALLBACK_MINUTES = 1
 
 #transition matrix
 def build_transition_matrix(offer_acc_prob: float) -> pd.DataFrame:
@@ -54,7 +59,8 @@ class CaseGenerator():
         w_rej: float = 0.1,
         offer_acc_prob: float = 0.6,
         param_pool: int = 400,
-        param_vacancies: int = 9
+        param_vacancies: int = 9,
+        seed: Optional[int] = None
         ) -> None:
         self.name = name
         self.remaining_pool = skellam.rvs(param_pool, int(param_pool*0.2), size=1)[0]
@@ -63,9 +69,11 @@ class CaseGenerator():
         self.now = self.init_date
         self.counter = 0
         self.per_impacted_list = []
+        self.n_offer_accepted = 0
         self.w_acc = w_acc
         self.w_rej = w_rej
         self.transition_matrix = build_transition_matrix(offer_acc_prob)
+        self.set_seed(seed)
 
     def _int_uniform(self, a: int, b: int) -> int:
         '''Generates a random number from a uniform distribution.
@@ -84,6 +92,34 @@ class CaseGenerator():
         self.num_vacancies = e_dict['num_vacancies']
         self.remaining_pool = e_dict['num_remaining_in_pool']
         self.per_impacted_list = e_dict['impacted_candidates_data']
+        self.n_offer_accepted = sum(1 for i in self.per_impacted_list if i['candidate_status'] == 'offer_accepted')
+
+    def set_seed(self, seed: Optional[int]) -> None:
+        '''Give the case its own random streams: one for the candidates invited, drawn a fixed
+        number of times per candidate, and one for the pending re-rolls. Two agents run on the
+        same seed then see the same response for the k-th invited candidate (common random numbers).
+        None falls back to the global numpy state.
+        ---
+        params:
+            seed: int or None
+        '''
+        self.impact_rs = np.random.RandomState([seed, 0]) if seed is not None else np.random
+        self.update_rs = np.random.RandomState([seed, 1]) if seed is not None else np.random
+
+    def __getstate__(self) -> dict:
+        # the unseeded streams are the numpy module itself: saved by reference, the
+        # global state is checkpointed separately
+        state = self.__dict__.copy()
+        for k in ('impact_rs', 'update_rs'):
+            if state.get(k) is np.random:
+                state[k] = None
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        self.__dict__.update(state)
+        for k in ('impact_rs', 'update_rs'):
+            if getattr(self, k, None) is None:
+                setattr(self, k, np.random)
 
     def set_name(self, new_name: str) -> None:
         '''Set correlation_id first id
@@ -117,12 +153,13 @@ class CaseGenerator():
             output_lst: List of dicts with impact data.
         '''
         output_lst = []
+        rs = self.impact_rs
         for i in range(n_imp):
-            draw = choice(
+            draw = rs.choice(
                 NOTIFICATION_STATUS,
                 1,
                 p=[1-(self.w_acc+self.w_rej), self.w_acc, self.w_rej])[0]
-            draw_candidate = choice(
+            draw_candidate = rs.choice(
                 self.transition_matrix[self.transition_matrix.notification_status == draw].offer_status,
                 1,
                 p=self.transition_matrix[self.transition_matrix.notification_status == draw].prob)[0]
@@ -130,11 +167,13 @@ class CaseGenerator():
             n = 1       # n samples
             k = 2.4     # shape
             lam = 10.5  # scale
-            if draw != 'ir_pending':
-                resp_time = weibull_min.rvs(k, loc=0, scale=lam, size=n).astype(int)[0] #not in fitdist test optims
-                #TODO: parametrized dist and args
-            else:
+            # always drawn, so every candidate consumes the same number of draws
+            resp_time = weibull_min.rvs(k, loc=0, scale=lam, size=n, random_state=rs).astype(int)[0] #not in fitdist test optims
+            #TODO: parametrized dist and args
+            if draw == 'ir_pending':
                 resp_time = mins
+            if draw_candidate == 'offer_accepted':
+                self.n_offer_accepted += 1
             output_lst.extend([
                     {
                         "notification_status": draw,
@@ -151,18 +190,19 @@ class CaseGenerator():
         params:
             mins: Minutes since de last call
         '''
+        rs = self.update_rs
         for impact in self.per_impacted_list:
             if impact['notification_status'] != 'ir_pending':
                 continue
             else:
                 pass
-            roll_notification = choice(
+            roll_notification = rs.choice(
                 NOTIFICATION_STATUS, 1,
                 p=[1-(self.w_acc+self.w_rej),
                 self.w_acc,
                 self.w_rej]
                 )[0]
-            roll_offer = choice(
+            roll_offer = rs.choice(
                 self.transition_matrix[self.transition_matrix.notification_status == roll_notification].offer_status,
                 1,
                 p=self.transition_matrix[self.transition_matrix.notification_status == roll_notification].prob
@@ -171,10 +211,12 @@ class CaseGenerator():
             if roll_notification == 'ir_pending':
                 roll_mins = impact['time_to_respond_ir_minutes'] + mins
             elif roll_notification == 'ir_accepted':
-                roll_mins = impact['time_to_respond_ir_minutes'] + min(mins, int(weibull_min.rvs(2.4, loc=0, scale=10, size=1).astype(int)[0]))
+                roll_mins = impact['time_to_respond_ir_minutes'] + min(mins, int(weibull_min.rvs(2.4, loc=0, scale=10, size=1, random_state=rs).astype(int)[0]))
             else:
-                roll_mins = impact['time_to_respond_ir_minutes'] + min(mins, int(weibull_min.rvs(2.4, loc=0, scale=10, size=1).astype(int)[0]))
+                roll_mins = impact['time_to_respond_ir_minutes'] + min(mins, int(weibull_min.rvs(2.4, loc=0, scale=10, size=1, random_state=rs).astype(int)[0]))
 
+            if roll_offer == 'offer_accepted':
+                self.n_offer_accepted += 1
             impact['notification_status'] = roll_notification
             impact['candidate_status'] = roll_offer
             impact['time_to_respond_ir_minutes'] = roll_mins
@@ -225,6 +267,17 @@ class CaseGenerator():
         self.counter += 1
         yield dict_req
 
+    def step(self, n_inv: int, mins: int) -> Optional[dict]:
+        '''Advance the environment one call, without the generator round-trip.
+        ---
+        params:
+            n_inv: number of notifications sent by the agent
+            mins: minutes callback sent by the agent
+        returns:
+            dict request body, or None once the case is over
+        '''
+        return next(self.generator(n_inv=n_inv, mins=mins), None)
+
     def online_generator():
         pass
 
@@ -259,11 +312,13 @@ class ScenarioSimulator():
         self.opt_obj = opt_obj
         self.case_obj = case_obj
 
-    def generator(self, initial_scenarios: list) -> list:
+    def generator(self, initial_scenarios: list, report: Optional[EvaluationReport] = None, keep_steps: bool = True) -> list:
         '''Create the scenario path given a previous state and agent interaction
         ---
         params:
             initial_scenarios: list of initial states
+            report: optional EvaluationReport updated after every call
+            keep_steps: keep the per call request dicts
         ---
         returns:
             req: list of all the results after the interaction of the agent with the environment
@@ -273,38 +328,86 @@ class ScenarioSimulator():
         ii = copy.deepcopy(initial_scenarios)
         for c in ii:
             #print(i)
-            self.case_obj.set_name(str(counter))
-            self.case_obj.reset_counter()
-            self.case_obj.init_from_event(c[0])
-            #case_suite = CaseGenerator(str(i), w_acc=0.1, w_rej=0.1, offer_acc_prob=0.6)
-            req = [True]
-            callback_time_minutes=1
-            num_candidates_needed=0
+            _l.extend(self.run_case(c[0], str(counter), report=report, keep_steps=keep_steps))
             counter += 1
-            while len(req) > 0:
-                # Optimizer Logic
-                req = [tup for tup in self.case_obj.generator(n_inv=num_candidates_needed,
-                                                           mins=callback_time_minutes )]
-                if len(req) > 0:
-                    #finished, num_candidates_needed, callback_time_minutes = opt_nbin.invitation_logic_api(
-                    finished, num_candidates_needed, callback_time_minutes = self.opt_obj.invitation_logic_api(
-                        now=req[0]["reference_date_time"],
-                        deadline=req[0]["deadline"],
-                        num_vacancies=req[0]["num_vacancies"],
-                        num_remaining_in_pool=req[0]["num_remaining_in_pool"],
-                        impacted_candidates_data=req[0]["impacted_candidates_data"]
-                    )
-                    req[0].update({'finished': finished})
-                    req[0].update({'num_candidates_needed': num_candidates_needed})
-                    req[0].update({'callback_time_minutes': callback_time_minutes})
-                    if len(req[0]["impacted_candidates_data"])>0:
-                        req[0].update({'total_accepted': pd.DataFrame(req[0]["impacted_candidates_data"]).candidate_status.str.contains('offer').sum()})
-                    else:
-                        req[0].update({'total_accepted':0})
-                    req[0].update({'optim': self.opt_obj})
-                _l.extend(req)
         return _l
 
+    def run_case(self, event: dict, name: str, report: Optional[EvaluationReport] = None, keep_steps: bool = True) -> list:
+        '''Run a single case from its initial event until the environment stops it.
+        ---
+        params:
+            event: initial state request dict, mutated in place
+            name: case name
+            report: optional EvaluationReport updated after every call
+            keep_steps: keep the per call request dicts
+        ---
+        returns:
+            _l: list of the results of this case
+        '''
+        _l = []
+        self.case_obj.set_name(name)
+        self.case_obj.reset_counter()
+        self.case_obj.init_from_event(event)
+        row = report.open_case(self.case_obj) if report is not None else None
+        #case_suite = CaseGenerator(str(i), w_acc=0.1, w_rej=0.1, offer_acc_prob=0.6)
+        req = True
+        callback_time_minutes = FIRST_CALLBACK_MINUTES
+        num_candidates_needed=0
+        minutes_elapsed = 0
+        while req is not None:
+            # Optimizer Logic
+            req = self.case_obj.step(n_inv=num_candidates_needed, mins=callback_time_minutes)
+            if req is not None:
+                minutes_elapsed += int(callback_time_minutes)
+                num_candidates_needed, callback_time_minutes = self.decide(req, report, row, minutes_elapsed, keep_steps, _l)
+        return _l
+
+    def decide(self, req: dict, report: Optional[EvaluationReport], row: Optional[int], minutes_elapsed: int, keep_steps: bool, _l: list) -> Tuple[int, int]:
+        '''Ask the agent about one request and record the call.
+        ---
+        params:
+            req: request dict yielded by the environment
+            report, row: EvaluationReport and row of the case, or None
+            minutes_elapsed: minutes since the case opened
+            keep_steps: append the request dict, with the decision, to _l
+            _l: list of the results of the case
+        ---
+        returns:
+            num_candidates_needed, callback_time_minutes of the next call
+        '''
+        #finished, num_candidates_needed, callback_time_minutes = opt_nbin.invitation_logic_api(
+        finished, num_candidates_needed, callback_time_minutes = self.opt_obj.invitation_logic_api(
+            now=req["reference_date_time"],
+            deadline=req["deadline"],
+            num_vacancies=req["num_vacancies"],
+            num_remaining_in_pool=req["num_remaining_in_pool"],
+            impacted_candidates_data=req["impacted_candidates_data"]
+        )
+        if report is not None:
+            report.record_step(row, self.case_obj, minutes_elapsed)
+        if keep_steps:
+            req.update({'finished': finished})
+            req.update({'num_candidates_needed': num_candidates_needed})
+            req.update({'callback_time_minutes': callback_time_minutes})
+            req.update({'total_accepted': self.case_obj.n_offer_accepted})
+            req.update({'optim': self.opt_obj})
+            _l.append(req)
+        return num_candidates_needed, callback_time_minutes
+
+    def evaluate(self, initial_scenarios: list, keep_steps: bool = False) -> EvaluationReport:
+        '''Run the scenarios and return only the per case metrics table.
+        ---
+        params:
+            initial_scenarios: list of initial states
+            keep_steps: also keep the per call dicts in self.steps
+        ---
+        returns:
+            report: EvaluationReport
+        '''
+        report = EvaluationReport(capacity=max(len(initial_scenarios), 1))
+        self.steps = self.generator(initial_scenarios, report=report, keep_steps=keep_steps)
+        return report
+
     def get_optim_current_state(self):
         '''Return the current state of the agent
         '''
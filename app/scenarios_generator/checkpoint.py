@@ -0,0 +1,323 @@
+"""
+Checkpoint and resume of long ScenarioSimulator runs.
+
+CheckpointedSimulator plays the scenarios like ScenarioSimulator.generator. Every
+`every_steps` calls it snapshots everything the rest of the run depends on:
+- the agent, with its NegativeBinomial posterior, l_per_frq and fitted dist;
+- the environment, with the in-place mutated per_impacted_list and its random streams;
+- the loop position inside the current case;
+- the EvaluationReport rows of the current case;
+- the global `random` and `numpy.random` states;
+- a key of the initial scenarios, so a run never resumes on another scenario set.
+
+The snapshot is pickled on the simulation thread, so it is consistent. A background
+thread compresses it and renames it into place, so the run never waits on the disk. A
+new snapshot replaces one still waiting to be written. Resuming from the file continues
+the run exactly as if it had not stopped.
+
+What belongs to the finished cases is not part of the snapshot, which would make every
+snapshot larger than the previous one. Each checkpoint appends what the cases finished
+since the previous checkpoint produced to side files, the EvaluationReport rows to
+`<path>.report` and, with keep_steps, the request dicts to `<path>.steps`. The snapshot
+records how far each file goes; on resume they are cut back to those offsets and read
+again. The request dicts of the current case stay in the snapshot: they share the
+impact list the environment still mutates.
+
+    sim = CheckpointedSimulator(ScenarioSimulator(OptimNegBinom(), CaseGenerator()), 'run.ckpt')
+    sim.run(corpus, keep_steps=False)        # after a crash, the same call resumes
+"""
+
+import copy
+import hashlib
+import os
+import pickle
+import random
+import threading
+import time
+import zlib
+from typing import Optional
+
+import numpy as np
+
+from .case_generator import FIRST_CALLBACK_MINUTES, ScenarioSimulator
+from .evaluation import EvaluationReport
+
+VERSION = 3
+
+
+class CheckpointWriter():
+    def __init__(self, path: str, compress_level: int = 1) -> None:
+        '''Background writer keeping only the latest pending snapshot.
+        ---
+        params:
+            path: checkpoint file
+            compress_level: zlib level, 1 favours speed
+        '''
+        self.path = path
+        self.compress_level = compress_level
+        self.pending = None
+        self.busy = False
+        self.n_written = 0
+        self.n_superseded = 0
+        self.write_seconds = 0.0
+        self.error = None
+        self.cond = threading.Condition()
+        self.thread = threading.Thread(target=self._loop, name='checkpoint-writer', daemon=True)
+        self.thread.start()
+
+    def submit(self, payload: bytes) -> None:
+        '''Queue a pickled snapshot, never blocking.
+        '''
+        with self.cond:
+            if self.pending is not None:
+                self.n_superseded += 1
+            self.pending = payload
+            self.cond.notify_all()
+
+    def _loop(self) -> None:
+        while True:
+            with self.cond:
+                while self.pending is None:
+                    self.cond.wait()
+                payload, self.pending = self.pending, None
+                self.busy = True
+            t0 = time.perf_counter()
+            try:
+                tmp = self.path + '.tmp'
+                with open(tmp, 'wb') as f:
+                    f.write(zlib.compress(payload, self.compress_level))
+                os.replace(tmp, self.path)
+                self.n_written += 1
+            except OSError as e:
+                self.error = e
+            self.write_seconds += time.perf_counter() - t0
+            with self.cond:
+                self.busy = False
+                self.cond.notify_all()
+
+    def flush(self) -> None:
+        '''Wait until the latest snapshot is on disk.
+        '''
+        with self.cond:
+            while self.pending is not None or self.busy:
+                self.cond.wait()
+        if self.error is not None:
+            raise self.error
+
+
+def _append_chunk(path: str, offset: int, obj) -> int:
+    '''Cut a side file back to offset and pickle obj after it.
+    ---
+    returns:
+        the new end offset
+    '''
+    with open(path, 'ab') as f:
+        f.truncate(offset)
+        pickle.dump(obj, f, protocol=pickle.HIGHEST_PROTOCOL)
+        return f.tell()
+
+
+def _read_chunks(path: str, offset: int) -> list:
+    '''Chunks of a side file up to offset; what a crash left after it is cut off.
+    '''
+    chunks = []
+    if not offset:
+        return chunks
+    with open(path, 'r+b') as f:
+        f.truncate(offset)
+        while f.tell() < offset:
+            chunks.append(pickle.load(f))
+    return chunks
+
+
+def load_checkpoint(path: str) -> dict:
+    with open(path, 'rb') as f:
+        state = pickle.loads(zlib.decompress(f.read()))
+    if state.get('version') != VERSION:
+        raise ValueError(f"Unsupported checkpoint version {state.get('version')}")
+    return state
+
+
+def scenarios_key(initial_scenarios) -> str:
+    '''Content hash of a list of initial states or of a ScenarioCorpus.
+    '''
+    h = hashlib.sha256()
+    columns = getattr(initial_scenarios, 'columns', None)
+    if columns is not None:
+        for name in sorted(columns):
+            h.update(name.encode())
+            h.update(np.ascontiguousarray(columns[name]).tobytes())
+    else:
+        h.update(pickle.dumps(list(initial_scenarios), protocol=pickle.HIGHEST_PROTOCOL))
+    return h.hexdigest()
+
+
+class CheckpointedSimulator():
+    def __init__(self, simulator: ScenarioSimulator, path: str, every_steps: int = 1000, compress_level: int = 1) -> None:
+        '''
+        ---
+        params:
+            simulator: ScenarioSimulator with the agent and the environment
+            path: checkpoint file
+            every_steps: agent calls between snapshots
+            compress_level: zlib level of the file
+        '''
+        self.simulator = simulator
+        self.path = path
+        self.every_steps = every_steps
+        self.writer = CheckpointWriter(path, compress_level)
+        self.n_steps = 0
+        self.serialize_seconds = 0.0
+        self.steps_path = path + '.steps'
+        self.report_path = path + '.report'
+        self.report = None
+        self.results = []
+        self.scenarios_key = None
+        self._position = None
+        self._reset_side_files()
+
+    def _reset_side_files(self) -> None:
+        # results / report rows of the finished cases, of those already in the side
+        # files, and the end offsets of the files
+        self._n_closed = self._n_saved = self._steps_offset = 0
+        self._rows_closed = self._rows_saved = self._report_offset = 0
+
+    def _close_cases(self) -> None:
+        '''Mark everything produced so far as belonging to finished cases.
+        '''
+        self._n_closed = len(self.results)
+        self._rows_closed = self.report.n_cases if self.report is not None else 0
+
+    def _save_side_files(self) -> None:
+        '''Append what the cases finished since the last checkpoint produced: request
+        dicts without the agent, which is the one of the snapshot, and report rows.
+        '''
+        if self._n_closed > self._n_saved:
+            new = [{k: v for k, v in r.items() if k != 'optim'} for r in self.results[self._n_saved:self._n_closed]]
+            self._steps_offset = _append_chunk(self.steps_path, self._steps_offset, new)
+            self._n_saved = self._n_closed
+        if self._rows_closed > self._rows_saved:
+            rows = self.report.rows(self._rows_saved, self._rows_closed)
+            self._report_offset = _append_chunk(self.report_path, self._report_offset, rows)
+            self._rows_saved = self._rows_closed
+
+    def checkpoint(self) -> None:
+        '''Snapshot the run now; written in the background.
+        '''
+        t0 = time.perf_counter()
+        self._save_side_files()
+        state = {
+            'version': VERSION,
+            'scenarios_key': self.scenarios_key,
+            'n_steps': self.n_steps,
+            'position': self._position,
+            'opt_obj': self.simulator.opt_obj,
+            'case_obj': self.simulator.case_obj,
+            'has_report': self.report is not None,
+            'report_rows': self._rows_saved,
+            'report_offset': self._report_offset,
+            'open_rows': self.report.rows(self._rows_saved, self.report.n_cases) if self.report is not None else None,
+            'n_results': self._n_saved,
+            'steps_offset': self._steps_offset,
+            'open_results': self.results[self._n_closed:],
+            'random_state': random.getstate(),
+            'np_random_state': np.random.get_state(),
+        }
+        payload = pickle.dumps(state, protocol=pickle.HIGHEST_PROTOCOL)
+        self.serialize_seconds += time.perf_counter() - t0
+        self.writer.submit(payload)
+
+    def restore(self, state: dict) -> None:
+        if state['scenarios_key'] != self.scenarios_key:
+            raise ValueError(f"Checkpoint {self.path} was written for other initial scenarios")
+        self.n_steps = state['n_steps']
+        self._position = state['position']
+        self.simulator.opt_obj = state['opt_obj']
+        self.simulator.case_obj = state['case_obj']
+        self.report = None
+        if state['has_report']:
+            self.report = EvaluationReport(capacity=max(state['report_rows'] + len(state['open_rows']['names']), 1))
+            for rows in _read_chunks(self.report_path, state['report_offset']) + [state['open_rows']]:
+                self.report.append_rows(rows)
+        self._report_offset = state['report_offset']
+        self._rows_closed = self._rows_saved = state['report_rows']
+        self._steps_offset = state['steps_offset']
+        self.results = [r for chunk in _read_chunks(self.steps_path, self._steps_offset) for r in chunk]
+        for r in self.results:
+            r['optim'] = self.simulator.opt_obj
+        self._n_closed = self._n_saved = state['n_results']
+        self.results.extend(state['open_results'])
+        random.setstate(state['random_state'])
+        np.random.set_state(state['np_random_state'])
+
+    def run(
+        self,
+        initial_scenarios: list,
+        report: Optional[EvaluationReport] = None,
+        keep_steps: bool = False,
+        resume: bool = True,
+        max_steps: Optional[int] = None
+        ) -> list:
+        '''Play the scenarios, resuming from the checkpoint file if there is one.
+        ---
+        params:
+            initial_scenarios: list of initial states or ScenarioCorpus, the same on every resume
+            report: optional EvaluationReport; on resume, the checkpointed one is used
+            keep_steps: keep the per call request dicts, saved to the steps file
+            resume: continue from the checkpoint file if it exists
+            max_steps: stop after this many calls in total, e.g. to split a run
+        ---
+        returns:
+            results: list of the request dicts, as ScenarioSimulator.generator
+        '''
+        self.report, self.results, self.n_steps, self._position = report, [], 0, None
+        self.scenarios_key = scenarios_key(initial_scenarios)
+        self._reset_side_files()
+        if resume and os.path.exists(self.path):
+            self.restore(load_checkpoint(self.path))
+        else:
+            for side_path in (self.steps_path, self.report_path):
+                if os.path.exists(side_path):
+                    os.remove(side_path)
+        sim = self.simulator
+        start = self._position['case'] if self._position is not None else 0
+        for c in range(start, len(initial_scenarios)):
+            if self._position is None or self._position['case'] != c:
+                self._close_cases()
+                event = copy.deepcopy(initial_scenarios[c])[0]
+                sim.case_obj.set_name(str(c))
+                sim.case_obj.reset_counter()
+                sim.case_obj.init_from_event(event)
+                row = self.report.open_case(sim.case_obj) if self.report is not None else None
+                self._position = {'case': c, 'row': row, 'num_candidates_needed': 0,
+                                  'callback_time_minutes': FIRST_CALLBACK_MINUTES, 'minutes_elapsed': 0}
+            pos = self._position
+            while True:
+                if max_steps is not None and self.n_steps >= max_steps:
+                    self.writer.flush()
+                    return self.results
+                req = sim.case_obj.step(n_inv=pos['num_candidates_needed'], mins=pos['callback_time_minutes'])
+                if req is None:
+                    break
+                pos['minutes_elapsed'] += int(pos['callback_time_minutes'])
+                pos['num_candidates_needed'], pos['callback_time_minutes'] = sim.decide(
+                    req, self.report, pos['row'], pos['minutes_elapsed'], keep_steps, self.results)
+                self.n_steps += 1
+                if self.n_steps % self.every_steps == 0:
+                    self.checkpoint()
+        self._position = {'case': len(initial_scenarios), 'row': None}
+        self._close_cases()
+        self.checkpoint()
+        self.writer.flush()
+        return self.results
+
+    def stats(self) -> dict:
+        '''Time spent on checkpoints by the simulation thread and by the writer.
+        '''
+        return {
+            'steps': self.n_steps,
+            'serialize_seconds': self.serialize_seconds,
+            'write_seconds': self.writer.write_seconds,
+            'written': self.writer.n_written,
+            'superseded': self.writer.n_superseded,
+        }
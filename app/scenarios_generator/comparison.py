@@ -0,0 +1,88 @@
+import copy
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+from .case_generator import CaseGenerator, ScenarioSimulator
+from .evaluation import EvaluationReport
+
+
+class ComparisonRunner():
+    def __init__(
+        self,
+        agents: dict,
+        seed: int = 0,
+        w_acc: float = 0.1,
+        w_rej: float = 0.1,
+        offer_acc_prob: float = 0.6
+        ) -> None:
+        '''Run several agents over the same initial scenarios and the same candidate
+        responses. Case c of every agent is seeded with `seed + c`, so the k-th candidate
+        invited answers the same way whatever the agent (common random numbers), and the
+        agent differences are measured on paired cases.
+        ---
+        params:
+            agents: name -> optimizer instance, e.g. {'nbinom': OptimNegBinom(), 'exp': OptimExp()}
+            seed: base seed of the candidate response streams
+            w_acc, w_rej, offer_acc_prob: environment probabilities, as in CaseGenerator
+        '''
+        self.agents = agents
+        self.seed = seed
+        self.simulators = {
+            name: ScenarioSimulator(agent, CaseGenerator(w_acc=w_acc, w_rej=w_rej, offer_acc_prob=offer_acc_prob))
+            for name, agent in agents.items()
+        }
+        self.reports = {}
+
+    def run(self, initial_scenarios: list) -> Dict[str, EvaluationReport]:
+        '''One pass over the scenarios, every case played by all the agents in turn.
+        ---
+        params:
+            initial_scenarios: list of initial states, as yielded by ScenarioInitializer
+        ---
+        returns:
+            reports: agent name -> EvaluationReport
+        '''
+        self.reports = {name: EvaluationReport(capacity=max(len(initial_scenarios), 1)) for name in self.agents}
+        for c, scenario in enumerate(initial_scenarios):
+            event = scenario[0]
+            for name, sim in self.simulators.items():
+                sim.case_obj.set_seed(self.seed + c)
+                case_event = dict(event, impacted_candidates_data=copy.deepcopy(event['impacted_candidates_data']))
+                sim.run_case(case_event, str(c), report=self.reports[name], keep_steps=False)
+        return self.reports
+
+    def summary(self) -> pd.DataFrame:
+        '''Aggregated metrics, one row per agent.
+        '''
+        return pd.DataFrame({name: r.summary() for name, r in self.reports.items()}).T
+
+    def compare(self, metric: str = 'profit', baseline: Optional[str] = None) -> pd.DataFrame:
+        '''Paired differences of a per case metric against a baseline agent.
+        ---
+        params:
+            metric: EvaluationReport column, e.g. profit, fill_rate, invitations
+            baseline: agent name, defaults to the first agent
+        ---
+        returns:
+            DataFrame with mean difference, paired and unpaired standard errors and paired t
+        '''
+        baseline = baseline or next(iter(self.reports))
+        base = self.reports[baseline].to_dict()[metric].astype(float)
+        n = len(base)
+        rows = {}
+        for name, report in self.reports.items():
+            if name == baseline:
+                continue
+            values = report.to_dict()[metric].astype(float)
+            diff = values - base
+            se_paired = diff.std(ddof=1) / np.sqrt(n) if n > 1 else np.nan
+            se_unpaired = np.sqrt((values.var(ddof=1) + base.var(ddof=1)) / n) if n > 1 else np.nan
+            rows[name] = {
+                'mean_diff': diff.mean(),
+                'se_paired': se_paired,
+                'se_unpaired': se_unpaired,
+                't_paired': diff.mean() / se_paired if se_paired else np.nan,
+            }
+        return pd.DataFrame(rows).T
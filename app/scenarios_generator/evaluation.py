@@ -0,0 +1,104 @@
+from typing import Dict
+
+import numpy as np
+import pandas as pd
+
+from app.optims.economics import COST_SPAM, PROFIT_VACANCY
+
+
+class EvaluationReport():
+    INT_COLUMNS = ['num_vacancies', 'initial_pool', 'offers_accepted', 'invitations', 'api_calls', 'minutes_elapsed']
+    FLOAT_COLUMNS = ['time_to_fill']
+
+    def __init__(self, capacity: int = 64) -> None:
+        '''Per-case metrics accumulated while the simulation runs, stored column-wise.
+        ---
+        params:
+            capacity: initial number of case rows, grown on demand
+        '''
+        self.n_cases = 0
+        self.names = []
+        self._cols = {c: np.zeros(capacity, dtype=np.int64) for c in self.INT_COLUMNS}
+        self._cols.update({c: np.full(capacity, np.nan) for c in self.FLOAT_COLUMNS})
+
+    def _grow(self) -> None:
+        for c, arr in self._cols.items():
+            extra = np.full(len(arr), np.nan) if arr.dtype.kind == 'f' else np.zeros(len(arr), dtype=arr.dtype)
+            self._cols[c] = np.concatenate([arr, extra])
+
+    def open_case(self, case_obj) -> int:
+        '''Register a case once initialized from its starting event.
+        ---
+        params:
+            case_obj: CaseGenerator
+        returns:
+            idx: row of the case
+        '''
+        if self.n_cases == len(self._cols['api_calls']):
+            self._grow()
+        idx = self.n_cases
+        self.names.append(case_obj.name)
+        self._cols['num_vacancies'][idx] = case_obj.num_vacancies
+        self._cols['initial_pool'][idx] = case_obj.remaining_pool
+        self._cols['offers_accepted'][idx] = case_obj.n_offer_accepted
+        self.n_cases += 1
+        return idx
+
+    def rows(self, start: int, stop: int) -> dict:
+        '''Copy of the case rows [start, stop), for append_rows.
+        '''
+        return {'names': self.names[start:stop], 'columns': {c: arr[start:stop].copy() for c, arr in self._cols.items()}}
+
+    def append_rows(self, rows: dict) -> None:
+        '''Append case rows taken with rows(), e.g. from another report.
+        '''
+        n = len(rows['names'])
+        while self.n_cases + n > len(self._cols['api_calls']):
+            self._grow()
+        for c, arr in rows['columns'].items():
+            self._cols[c][self.n_cases:self.n_cases + n] = arr
+        self.names.extend(rows['names'])
+        self.n_cases += n
+
+    def record_step(self, idx: int, case_obj, minutes_elapsed: int) -> None:
+        '''Update a case row after one API call.
+        ---
+        params:
+            idx: row returned by open_case
+            case_obj: CaseGenerator after the step
+            minutes_elapsed: virtual minutes since the case opened
+        '''
+        cols = self._cols
+        cols['api_calls'][idx] += 1
+        cols['offers_accepted'][idx] = case_obj.n_offer_accepted
+        cols['invitations'][idx] = cols['initial_pool'][idx] - case_obj.remaining_pool
+        cols['minutes_elapsed'][idx] = minutes_elapsed
+        if np.isnan(cols['time_to_fill'][idx]) and case_obj.n_offer_accepted >= cols['num_vacancies'][idx]:
+            cols['time_to_fill'][idx] = minutes_elapsed
+
+    def to_dict(self) -> Dict[str, np.ndarray]:
+        '''Columnar table, one entry per case, with the derived economics.
+        '''
+        out = {c: arr[:self.n_cases] for c, arr in self._cols.items()}
+        filled = np.minimum(out['offers_accepted'], out['num_vacancies'])
+        out['vacancies_filled'] = filled
+        out['fill_rate'] = np.divide(filled, out['num_vacancies'], out=np.ones(self.n_cases), where=out['num_vacancies'] > 0)
+        out['profit'] = PROFIT_VACANCY * filled - COST_SPAM * out['invitations']
+        out['case'] = np.asarray(self.names)
+        return out
+
+    def to_frame(self) -> pd.DataFrame:
+        return pd.DataFrame(self.to_dict()).set_index('case')
+
+    def summary(self) -> Dict[str, float]:
+        '''Aggregates over all the cases.
+        '''
+        d = self.to_dict()
+        return {
+            'cases': self.n_cases,
+            'fill_rate': float(d['fill_rate'].mean()) if self.n_cases else np.nan,
+            'invitations': float(d['invitations'].mean()) if self.n_cases else np.nan,
+            'api_calls': float(d['api_calls'].mean()) if self.n_cases else np.nan,
+            'time_to_fill': float(np.nanmean(d['time_to_fill'])) if np.isfinite(d['time_to_fill']).any() else np.nan,
+            'profit': float(d['profit'].mean()) if self.n_cases else np.nan,
+        }
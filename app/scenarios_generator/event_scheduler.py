@@ -0,0 +1,138 @@
+import copy
+import heapq
+from typing import List, Optional
+
+from .case_generator import FIRST_CALLBACK_MINUTES, CaseGenerator
+from .evaluation import EvaluationReport
+
+
+class EventScheduler():
+    def __init__(
+        self,
+        opt_obj,
+        w_acc: float = 0.1,
+        w_rej: float = 0.1,
+        offer_acc_prob: float = 0.6,
+        coalescer=None
+        ) -> None:
+        '''Discrete-event counterpart of ScenarioSimulator. Every case gets its own
+        environment and all of them share one virtual clock, in minutes since the case
+        opened. Calls falling on the same minute are decided together through
+        `invitation_logic_batch`.
+        ---
+        params:
+            opt_obj: agent shared by all the cases
+            w_acc, w_rej, offer_acc_prob: environment probabilities, as in CaseGenerator
+            coalescer: optional CallbackCoalescer applied to the callbacks, on the virtual clock
+        '''
+        self.opt_obj = opt_obj
+        self.coalescer = coalescer
+        self.w_acc = w_acc
+        self.w_rej = w_rej
+        self.offer_acc_prob = offer_acc_prob
+        self.now = 0
+        self.n_events = 0
+        self.n_batches = 0
+
+    def _build_cases(self, initial_scenarios: list) -> List[CaseGenerator]:
+        cases = []
+        for c, scenario in enumerate(copy.deepcopy(initial_scenarios)):
+            case_obj = CaseGenerator(name=str(c), w_acc=self.w_acc, w_rej=self.w_rej, offer_acc_prob=self.offer_acc_prob)
+            case_obj.init_from_event(scenario[0])
+            cases.append(case_obj)
+        return cases
+
+    def generator(
+        self,
+        initial_scenarios: list,
+        stop_when_filled: bool = True,
+        until: Optional[int] = None,
+        report: Optional[EvaluationReport] = None,
+        keep_steps: bool = True
+        ) -> list:
+        '''Run all the cases interleaved on the virtual clock.
+        ---
+        params:
+            initial_scenarios: list of initial states, as yielded by ScenarioInitializer
+            stop_when_filled: stop calling a case once its vacancies are all accepted
+            until: optional virtual minute after which no event is processed
+            report: optional EvaluationReport updated after every call
+            keep_steps: keep the per call request dicts
+        ---
+        returns:
+            _l: request dicts with the agent decision, in virtual time order
+        '''
+        cases = self._build_cases(initial_scenarios)
+        rows = [report.open_case(case_obj) for case_obj in cases] if report is not None else None
+        # (virtual minute, sequence, case index, invitations to send, minutes since last call)
+        queue = [(FIRST_CALLBACK_MINUTES, c, c, 0, FIRST_CALLBACK_MINUTES) for c in range(len(cases))]
+        heapq.heapify(queue)
+        seq = len(queue)
+        _l = []
+        while queue:
+            t = queue[0][0]
+            if until is not None and t > until:
+                break
+            self.now = t
+            batch = []
+            while queue and queue[0][0] == t:
+                _, _, c, n_inv, mins = heapq.heappop(queue)
+                req = cases[c].step(n_inv=n_inv, mins=mins)
+                if req is not None:
+                    batch.append((c, req))
+            if not batch:
+                continue
+            decisions = self.opt_obj.invitation_logic_batch([
+                {
+                    "now": req["reference_date_time"],
+                    "deadline": req["deadline"],
+                    "num_vacancies": req["num_vacancies"],
+                    "num_remaining_in_pool": req["num_remaining_in_pool"],
+                    "impacted_candidates_data": req["impacted_candidates_data"],
+                } for _, req in batch
+            ])
+            self.n_events += len(batch)
+            self.n_batches += 1
+            for (c, req), (finished, num_candidates_needed, callback_time_minutes) in zip(batch, decisions):
+                case_obj = cases[c]
+                if self.coalescer is not None and not finished:
+                    to_deadline = (req["deadline"] - req["reference_date_time"]).total_seconds() / 60
+                    callback_time_minutes = self.coalescer.snap_minutes(t, t + to_deadline, int(callback_time_minutes))
+                if report is not None:
+                    report.record_step(rows[c], case_obj, t)
+                if keep_steps:
+                    req.update({
+                        'finished': finished,
+                        'num_candidates_needed': num_candidates_needed,
+                        'callback_time_minutes': callback_time_minutes,
+                        'total_accepted': case_obj.n_offer_accepted,
+                        'virtual_minute': t,
+                        'optim': self.opt_obj,
+                    })
+                    _l.append(req)
+                filled = stop_when_filled and case_obj.n_offer_accepted >= case_obj.num_vacancies
+                if finished or filled or callback_time_minutes <= 0:
+                    continue
+                heapq.heappush(queue, (t + int(callback_time_minutes), seq, c, num_candidates_needed, callback_time_minutes))
+                seq += 1
+        return _l
+
+    def evaluate(self, initial_scenarios: list, keep_steps: bool = False, **kwargs) -> EvaluationReport:
+        '''Run the scenarios and return only the per case metrics table.
+        ---
+        params:
+            initial_scenarios: list of initial states
+            keep_steps: also keep the per call dicts in self.steps
+            kwargs: forwarded to generator (stop_when_filled, until)
+        ---
+        returns:
+            report: EvaluationReport
+        '''
+        report = EvaluationReport(capacity=max(len(initial_scenarios), 1))
+        self.steps = self.generator(initial_scenarios, report=report, keep_steps=keep_steps, **kwargs)
+        return report
+
+    def get_optim_current_state(self):
+        '''Return the current state of the agent
+        '''
+        return self.opt_obj
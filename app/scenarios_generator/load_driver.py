@@ -0,0 +1,162 @@
+"""
+Closed-loop load driver for the optimizer API.
+
+Every simulated job opening is a `CaseGenerator` that posts its state to an endpoint,
+then waits for the returned `callback_time_minutes` on a compressed virtual clock
+before posting again. Openings run concurrently on asyncio over a pooled HTTP client.
+
+    python -m app.scenarios_generator.load_driver http://127.0.0.1:8000 --openings 2000 --speedup 6000
+"""
+
+import argparse
+import asyncio
+import datetime as dt
+import json
+import time
+from typing import Dict, List, Optional
+
+import httpx
+import numpy as np
+
+from .case_generator import CaseGenerator
+
+ENDPOINTS = ["/optim-exp/", "/optim-nbinomial/", "/optim-stoch-constraint/"]
+
+
+def _json_default(o):
+    if isinstance(o, (dt.datetime, dt.date)):
+        return o.isoformat()
+    if isinstance(o, np.generic):
+        return o.item()
+    raise TypeError(f"{type(o)} is not JSON serializable")
+
+
+def to_payload(req: dict) -> bytes:
+    '''Serialize a `CaseGenerator` request dict into a ModelParams JSON body.
+    ---
+    params:
+        req: dict yielded by CaseGenerator.generator
+    returns:
+        JSON bytes
+    '''
+    return json.dumps({
+        "now": req["reference_date_time"],
+        "deadline": req["deadline"],
+        "num_vacancies": req["num_vacancies"],
+        "num_remaining_in_pool": req["num_remaining_in_pool"],
+        "impacted_candidates_data": req["impacted_candidates_data"],
+    }, default=_json_default).encode()
+
+
+class EndpointStats():
+    def __init__(self) -> None:
+        self.latencies = []
+        self.errors = 0
+
+    def summary(self, elapsed: float) -> Dict[str, float]:
+        lat = np.asarray(self.latencies) if self.latencies else np.zeros(1)
+        n = len(self.latencies)
+        return {
+            "requests": n,
+            "errors": self.errors,
+            "error_rate": self.errors / n if n else 0.0,
+            "rps": n / elapsed if elapsed > 0 else 0.0,
+            "p50_ms": float(np.percentile(lat, 50)),
+            "p95_ms": float(np.percentile(lat, 95)),
+            "p99_ms": float(np.percentile(lat, 99)),
+        }
+
+
+class LoadDriver():
+    def __init__(
+        self,
+        endpoints: List[str] = ENDPOINTS,
+        n_openings: int = 1000,
+        concurrency: int = 100,
+        speedup: float = 6000,
+        max_steps: int = 50,
+        timeout: float = 30,
+    ) -> None:
+        '''
+        ---
+        params:
+            endpoints: route paths; openings are spread round-robin over them
+            n_openings: number of simulated job openings
+            concurrency: pooled connections and maximum in-flight requests
+            speedup: virtual seconds elapsed per wall-clock second
+            max_steps: cap of API calls per opening
+            timeout: per request timeout in seconds
+        '''
+        self.endpoints = endpoints
+        self.n_openings = n_openings
+        self.concurrency = concurrency
+        self.speedup = speedup
+        self.max_steps = max_steps
+        self.timeout = timeout
+        self.stats = {e: EndpointStats() for e in endpoints}
+        self.elapsed = 0.0
+
+    async def _opening(self, client: httpx.AsyncClient, sem: asyncio.Semaphore, i: int) -> None:
+        endpoint = self.endpoints[i % len(self.endpoints)]
+        stats = self.stats[endpoint]
+        case = CaseGenerator(name=str(i))
+        num_candidates_needed, callback_time_minutes = 0, 1
+        for _ in range(self.max_steps):
+            req = next(case.generator(n_inv=num_candidates_needed, mins=callback_time_minutes), None)
+            if req is None:
+                return
+            async with sem:
+                t0 = time.perf_counter()
+                try:
+                    resp = await client.post(endpoint, content=to_payload(req),
+                                             headers={"Content-Type": "application/json"})
+                    resp.raise_for_status()
+                    finished, num_candidates_needed, callback_time_minutes = resp.json()
+                except (httpx.HTTPError, ValueError):
+                    stats.errors += 1
+                    stats.latencies.append((time.perf_counter() - t0) * 1000)
+                    return
+                stats.latencies.append((time.perf_counter() - t0) * 1000)
+            if finished:
+                return
+            await asyncio.sleep(callback_time_minutes * 60 / self.speedup)
+
+    async def run(self, base_url: str = "http://127.0.0.1:8000", transport: Optional[httpx.AsyncBaseTransport] = None) -> Dict[str, Dict[str, float]]:
+        '''Drive all openings to completion and return per endpoint statistics.
+        ---
+        params:
+            base_url: server address
+            transport: optional httpx transport, e.g. httpx.ASGITransport(app) to run in-process
+        returns:
+            endpoint -> requests, errors, error_rate, rps, latency percentiles
+        '''
+        limits = httpx.Limits(max_connections=self.concurrency, max_keepalive_connections=self.concurrency)
+        sem = asyncio.Semaphore(self.concurrency)
+        t0 = time.perf_counter()
+        async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=self.timeout, transport=transport) as client:
+            await asyncio.gather(*(self._opening(client, sem, i) for i in range(self.n_openings)))
+        self.elapsed = time.perf_counter() - t0
+        return self.report()
+
+    def report(self) -> Dict[str, Dict[str, float]]:
+        return {e: s.summary(self.elapsed) for e, s in self.stats.items()}
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Closed-loop load test of the optimizer API.")
+    parser.add_argument("base_url", nargs="?", default="http://127.0.0.1:8000")
+    parser.add_argument("--endpoint", action="append", default=None, help="route path; repeatable")
+    parser.add_argument("--openings", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--speedup", type=float, default=6000)
+    parser.add_argument("--max-steps", type=int, default=50)
+    args = parser.parse_args(argv)
+
+    driver = LoadDriver(endpoints=args.endpoint or ENDPOINTS, n_openings=args.openings,
+                        concurrency=args.concurrency, speedup=args.speedup, max_steps=args.max_steps)
+    report = asyncio.run(driver.run(args.base_url))
+    print(json.dumps({"elapsed_s": driver.elapsed, "endpoints": report}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
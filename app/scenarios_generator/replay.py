@@ -0,0 +1,306 @@
+"""
+Offline replay of logged production requests.
+
+Streams a uvicorn `log` file (`POST REQ {...}` lines) or a JSONL capture, parses each
+request into `ModelParams` and runs it through one or several optimizers or HTTP
+endpoints, comparing decisions and latency between them. Batch (`[...]`) and portfolio
+(`{'openings': [...]}`) bodies expand to one request per opening, and `POST STREAM`
+lines to a request whose impact records are rebuilt from the logged aggregates.
+
+    python -m app.scenarios_generator.replay log --target optim-nbinomial --target optim-exp
+"""
+
+import argparse
+import ast
+import gzip
+import itertools
+import json
+import time
+import urllib.request
+from multiprocessing import Pool
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+from pydantic import ValidationError
+
+from app.optims.registry import OPTIMIZERS, get_optimizer
+from app.optims.utils import ImpactAggregate
+from app.schemas import ModelParams
+
+LOG_MARKER = "POST REQ "
+STREAM_MARKER = "POST STREAM "
+REQUIRED_FIELDS = set(ModelParams.__fields__)
+
+
+def _open_text(path: str):
+    '''Open a plain or gzipped capture in text mode.
+    ---
+    params:
+        path: capture path
+    '''
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt")
+    return open(path, "r")
+
+
+def _decode_line(line: str) -> Any:
+    '''Decoded body of a log or JSONL line, None if there is none.
+    '''
+    line = line.strip()
+    if line.startswith(("{", "[")):
+        try:
+            return json.loads(line)
+        except ValueError:
+            return None
+    pos = line.find(STREAM_MARKER)
+    if pos >= 0:
+        # POST STREAM <optimizer> {header and impact aggregates as JSON}.
+        raw = line[pos + len(STREAM_MARKER):].partition(" ")[2].rstrip(".")
+        try:
+            payload = json.loads(raw)
+            payload["impacted_candidates_data"] = ImpactAggregate.summary_records(payload.pop("impacts"))
+        except (ValueError, KeyError, TypeError, AttributeError):
+            return None
+        return payload
+    pos = line.find(LOG_MARKER)
+    if pos < 0:
+        return None
+    raw = line[pos + len(LOG_MARKER):].rstrip(".")
+    try:
+        return ast.literal_eval(raw)
+    except (ValueError, SyntaxError):
+        return None
+
+
+def parse_requests(line: str) -> List[dict]:
+    '''Extract the request payloads of a log or JSONL line.
+    ---
+    params:
+        line: a `POST REQ` or `POST STREAM` log line, or a JSON line
+    returns:
+        payload dicts, one per opening of a batch or portfolio body; empty if the
+        line does not hold an optimizer request
+    '''
+    payload = _decode_line(line)
+    if isinstance(payload, dict) and isinstance(payload.get("openings"), list):
+        payload = payload["openings"]
+    items = payload if isinstance(payload, list) else [payload]
+    return [p for p in items if isinstance(p, dict) and REQUIRED_FIELDS.issubset(p)]
+
+
+def parse_line(line: str) -> Optional[dict]:
+    '''Extract a single request payload from a log or JSONL line.
+    ---
+    params:
+        line: a `POST REQ {...}` log line or a JSON object line
+    returns:
+        payload dict, or None if the line does not hold one optimizer request
+    '''
+    payload = _decode_line(line)
+    if not isinstance(payload, dict) or not REQUIRED_FIELDS.issubset(payload):
+        return None
+    return payload
+
+
+def iter_requests(path: str) -> Iterator[dict]:
+    '''Stream request payloads from a capture, one line at a time.
+    ---
+    params:
+        path: log, JSONL or gzipped capture
+    yields:
+        payload dicts
+    '''
+    with _open_text(path) as f:
+        for line in f:
+            yield from parse_requests(line)
+
+
+def throttle(requests: Iterable, rate: Optional[float]) -> Iterator:
+    '''Release items at most `rate` per second. None releases as fast as possible.
+    ---
+    params:
+        requests: iterable of items
+        rate: items per second
+    '''
+    if not rate:
+        yield from requests
+        return
+    interval = 1.0 / rate
+    next_ts = time.perf_counter()
+    for item in requests:
+        wait = next_ts - time.perf_counter()
+        if wait > 0:
+            time.sleep(wait)
+        next_ts = max(next_ts + interval, time.perf_counter() - interval)
+        yield item
+
+
+def call_target(target: str, params: ModelParams) -> Tuple[bool, int, int]:
+    '''Run one request against an optimizer name or an http(s) URL.
+    ---
+    params:
+        target: optimizer route name or endpoint URL
+        params: parsed request
+    returns:
+        finished, num_candidates_needed, callback_time_minutes
+    '''
+    if target.startswith(("http://", "https://")):
+        req = urllib.request.Request(
+            target,
+            data=params.json().encode(),
+            headers={"Content-Type": "application/json"},
+            method="POST",
+        )
+        with urllib.request.urlopen(req, timeout=30) as resp:
+            finished, num_candidates_needed, callback_time_minutes = json.loads(resp.read())
+    else:
+        finished, num_candidates_needed, callback_time_minutes = get_optimizer(target).invitation_logic_api(
+            now=params.now,
+            deadline=params.deadline,
+            num_vacancies=params.num_vacancies,
+            num_remaining_in_pool=params.num_remaining_in_pool,
+            impacted_candidates_data=params.impacted_candidates_data,
+        )
+    return bool(finished), int(num_candidates_needed), int(callback_time_minutes)
+
+
+def replay_one(job: Tuple[int, dict, List[str]]) -> dict:
+    '''Replay a single payload against every target. Runs inside pool workers.
+    ---
+    params:
+        job: (request index, payload, targets)
+    returns:
+        dict with the decision, latency in ms and error for each target
+    '''
+    idx, payload, targets = job
+    out = {"idx": idx, "results": {}}
+    try:
+        params = ModelParams(**payload)
+    except ValidationError as e:
+        out["error"] = str(e)
+        return out
+    for target in targets:
+        t0 = time.perf_counter()
+        try:
+            decision, error = call_target(target, params), None
+        except Exception as e:
+            decision, error = None, repr(e)
+        out["results"][target] = {
+            "decision": decision,
+            "latency_ms": (time.perf_counter() - t0) * 1000,
+            "error": error,
+        }
+    return out
+
+
+class ReplayReport():
+    def __init__(self, targets: List[str]) -> None:
+        self.targets = targets
+        self.n_requests = 0
+        self.n_invalid = 0
+        self.latencies = {t: [] for t in targets}
+        self.errors = {t: 0 for t in targets}
+        self.agree = {t: 0 for t in targets}
+
+    def add(self, result: dict) -> None:
+        '''Fold one replay result into the running report. Decisions are compared
+        against the first target.
+        ---
+        params:
+            result: output of `replay_one`
+        '''
+        self.n_requests += 1
+        if "error" in result:
+            self.n_invalid += 1
+            return
+        baseline = result["results"][self.targets[0]]["decision"]
+        for target, res in result["results"].items():
+            self.latencies[target].append(res["latency_ms"])
+            if res["error"] is not None:
+                self.errors[target] += 1
+            elif res["decision"] == baseline:
+                self.agree[target] += 1
+
+    def summary(self) -> Dict[str, Dict[str, Any]]:
+        '''Per target latency percentiles, error count and agreement with the first target.
+        '''
+        valid = max(self.n_requests - self.n_invalid, 1)
+        out = {}
+        for target in self.targets:
+            lat = np.asarray(self.latencies[target]) if self.latencies[target] else np.zeros(1)
+            out[target] = {
+                "requests": self.n_requests - self.n_invalid,
+                "errors": self.errors[target],
+                "agreement": self.agree[target] / valid,
+                "p50_ms": float(np.percentile(lat, 50)),
+                "p95_ms": float(np.percentile(lat, 95)),
+                "p99_ms": float(np.percentile(lat, 99)),
+                "max_ms": float(lat.max()),
+            }
+        return out
+
+
+def replay(
+    path: str,
+    targets: List[str],
+    rate: Optional[float] = None,
+    processes: int = 1,
+    chunksize: int = 16,
+    out_path: Optional[str] = None,
+    limit: Optional[int] = None,
+) -> ReplayReport:
+    '''Replay a capture against the targets and build a comparison report.
+    ---
+    params:
+        path: log, JSONL or gzipped capture
+        targets: optimizer route names or endpoint URLs; the first one is the baseline
+        rate: requests per second, None for as fast as possible
+        processes: worker processes, 1 runs in the current process
+        chunksize: payloads handed to a worker at a time
+        out_path: optional JSONL file with every per-request result
+        limit: replay only the first `limit` requests
+    returns:
+        report: ReplayReport
+    '''
+    report = ReplayReport(targets)
+    # islice stops reading the capture after `limit` requests
+    jobs = ((i, payload, targets) for i, payload in enumerate(itertools.islice(iter_requests(path), limit)))
+    jobs = throttle(jobs, rate)
+    out = open(out_path, "w") if out_path else None
+    try:
+        if processes > 1:
+            with Pool(processes) as pool:
+                for result in pool.imap(replay_one, jobs, chunksize=chunksize):
+                    report.add(result)
+                    if out:
+                        out.write(json.dumps(result) + "\n")
+        else:
+            for result in map(replay_one, jobs):
+                report.add(result)
+                if out:
+                    out.write(json.dumps(result) + "\n")
+    finally:
+        if out:
+            out.close()
+    return report
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Replay logged optimizer requests.")
+    parser.add_argument("path", help="log, JSONL or .gz capture")
+    parser.add_argument("--target", action="append", required=True,
+                        help=f"optimizer ({', '.join(OPTIMIZERS)}) or endpoint URL; repeatable")
+    parser.add_argument("--rate", type=float, default=None, help="requests per second")
+    parser.add_argument("--processes", type=int, default=1)
+    parser.add_argument("--out", default=None, help="per-request JSONL output")
+    parser.add_argument("--limit", type=int, default=None)
+    args = parser.parse_args(argv)
+
+    report = replay(args.path, args.target, rate=args.rate, processes=args.processes,
+                    out_path=args.out, limit=args.limit)
+    print(json.dumps({"requests": report.n_requests, "invalid": report.n_invalid,
+                      "targets": report.summary()}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+"""
+On-disk corpus of initial scenarios.
+
+ScenarioInitializer builds one CaseGenerator per case, drawing the Skellam pool sizes and
+the dates one by one, and every ScenarioSimulator run deep-copies the result. The corpus
+draws the same distributions for all the cases at once, stores them as one .npy column
+per field under a directory keyed by the seed and the parameters, and loads the columns
+memory-mapped. Simulators and pool workers share the pages of the same files: nothing is
+deep-copied, every case event is built fresh when it is read, and pickling a loaded
+corpus only sends its path.
+
+    corpus = ScenarioCorpus.cached('scenarios/', n_cases=10000, seed=0)
+    ScenarioSimulator(OptimNegBinom(), CaseGenerator()).evaluate(corpus)
+"""
+
+import datetime
+import hashlib
+import json
+import os
+import tempfile
+from typing import Dict, Iterator, List, Optional
+
+import numpy as np
+from scipy.stats import skellam
+
+COLUMNS = ['init_date', 'deadline', 'num_vacancies', 'num_remaining_in_pool']
+VERSION = 1
+
+
+def corpus_key(n_cases: int, seed: int, param_pool: int = 400, param_vacancies: int = 9) -> str:
+    raw = json.dumps({'n_cases': n_cases, 'seed': seed, 'param_pool': param_pool,
+                      'param_vacancies': param_vacancies, 'version': VERSION}, sort_keys=True)
+    return hashlib.sha1(raw.encode()).hexdigest()[:16]
+
+
+def draw_columns(n_cases: int, seed: int, param_pool: int = 400, param_vacancies: int = 9) -> Dict[str, np.ndarray]:
+    '''The CaseGenerator initial state of n cases, vectorized.
+    ---
+    params:
+        n_cases: number of cases
+        seed: generator seed
+        param_pool, param_vacancies: Skellam mu1, as in CaseGenerator
+    returns:
+        column name -> array of length n_cases
+    '''
+    rng = np.random.default_rng(seed)
+    pool = skellam.rvs(param_pool, int(param_pool * 0.2), size=n_cases, random_state=rng)
+    vacancies = skellam.rvs(param_vacancies, int(param_vacancies * 0.2), size=n_cases, random_state=rng)
+    # same draws as CaseGenerator.get_dates: month 1-11, day 1-27, up to 19 days long
+    month = rng.uniform(1, 12, n_cases).astype(np.int64)
+    day = rng.uniform(1, 28, n_cases).astype(np.int64)
+    span_days = rng.uniform(1, 20, n_cases).astype(np.int64)
+    init_date = (np.datetime64('2022-01-01', 'M') + (month - 1)).astype('datetime64[D]') + (day - 1)
+    length_us = np.round(rng.random(n_cases) * span_days * 86400e6).astype(np.int64)
+    return {
+        'init_date': init_date.astype('datetime64[us]'),
+        'deadline': init_date.astype('datetime64[us]') + length_us.astype('timedelta64[us]'),
+        'num_vacancies': vacancies.astype(np.int64),
+        'num_remaining_in_pool': pool.astype(np.int64),
+    }
+
+
+class ScenarioCorpus():
+    def __init__(self, columns: Dict[str, np.ndarray], meta: Optional[dict] = None, path: Optional[str] = None) -> None:
+        '''Initial scenarios in columnar form. Iterating yields `[event]` lists, the format
+        of ScenarioInitializer, so the corpus can be passed wherever a list of initial
+        states is expected.
+        ---
+        params:
+            columns: column name -> array, see COLUMNS
+            meta: parameters the corpus was drawn with
+            path: directory the columns were loaded from, if any
+        '''
+        self.columns = columns
+        self.meta = meta or {}
+        self.path = path
+
+    @classmethod
+    def build(cls, n_cases: int, seed: int = 0, param_pool: int = 400, param_vacancies: int = 9) -> 'ScenarioCorpus':
+        meta = {'n_cases': n_cases, 'seed': seed, 'param_pool': param_pool,
+                'param_vacancies': param_vacancies, 'version': VERSION}
+        return cls(draw_columns(n_cases, seed, param_pool, param_vacancies), meta)
+
+    def save(self, path: str) -> None:
+        '''Write the columns to a directory, renamed into place once complete.
+        '''
+        parent = os.path.dirname(os.path.abspath(path))
+        os.makedirs(parent, exist_ok=True)
+        tmp = tempfile.mkdtemp(dir=parent, suffix='.tmp')
+        for name in COLUMNS:
+            np.save(os.path.join(tmp, f'{name}.npy'), np.ascontiguousarray(self.columns[name]))
+        with open(os.path.join(tmp, 'meta.json'), 'w') as f:
+            json.dump(self.meta, f)
+        try:
+            os.rename(tmp, path)
+        except OSError:
+            # another worker saved the same corpus first
+            for name in os.listdir(tmp):
+                os.remove(os.path.join(tmp, name))
+            os.rmdir(tmp)
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True) -> 'ScenarioCorpus':
+        '''Load a saved corpus, memory-mapped read-only by default.
+        '''
+        with open(os.path.join(path, 'meta.json')) as f:
+            meta = json.load(f)
+        mode = 'r' if mmap else None
+        columns = {name: np.load(os.path.join(path, f'{name}.npy'), mmap_mode=mode) for name in COLUMNS}
+        return cls(columns, meta, path)
+
+    @classmethod
+    def cached(cls, cache_dir: str, n_cases: int, seed: int = 0, param_pool: int = 400, param_vacancies: int = 9) -> 'ScenarioCorpus':
+        '''Load the corpus of these parameters from cache_dir, drawing and saving it the first time.
+        '''
+        path = os.path.join(cache_dir, corpus_key(n_cases, seed, param_pool, param_vacancies))
+        if not os.path.exists(os.path.join(path, 'meta.json')):
+            cls.build(n_cases, seed, param_pool, param_vacancies).save(path)
+        return cls.load(path)
+
+    def head(self, n: int) -> 'ScenarioCorpus':
+        '''First n cases, as views of the same columns.
+        '''
+        return ScenarioCorpus({k: v[:n] for k, v in self.columns.items()}, self.meta, self.path)
+
+    def event(self, c: int) -> dict:
+        '''Initial request of case c, as CaseGenerator yields it after the first one minute callback.
+        '''
+        init_date = self.columns['init_date'][c].item()
+        return {
+            "correlation_id": f"Case{c}_0",
+            "reference_date_time": init_date + datetime.timedelta(minutes=1),
+            "deadline": self.columns['deadline'][c].item(),
+            "num_vacancies": int(self.columns['num_vacancies'][c]),
+            "num_remaining_in_pool": int(self.columns['num_remaining_in_pool'][c]),
+            "impacted_candidates_data": []
+        }
+
+    def __len__(self) -> int:
+        return len(self.columns['num_vacancies'])
+
+    def __getitem__(self, c: int) -> List[dict]:
+        if not -len(self) <= c < len(self):
+            raise IndexError(c)
+        return [self.event(c % len(self))]
+
+    def __iter__(self) -> Iterator[List[dict]]:
+        for c in range(len(self)):
+            yield [self.event(c)]
+
+    def __deepcopy__(self, memo) -> 'ScenarioCorpus':
+        # read-only columns, and every event is a new dict
+        return self
+
+    def __reduce__(self):
+        if self.path is not None:
+            return (_load_head, (self.path, len(self)))
+        return (ScenarioCorpus, ({k: np.asarray(v) for k, v in self.columns.items()}, self.meta))
+
+
+def _load_head(path: str, n: int) -> ScenarioCorpus:
+    return ScenarioCorpus.load(path).head(n)
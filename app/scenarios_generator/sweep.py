@@ -0,0 +1,255 @@
+"""
+Hyperparameter sweeps of the optimizers through the scenario simulator.
+
+Configurations come from a grid or are sampled from a search space, are evaluated in a
+process pool and pruned by successive halving: every rung keeps the best 1/eta of the
+configurations and plays them on eta times more cases. Finished evaluations are cached
+on disk so an interrupted sweep resumes where it stopped.
+
+    runner = SweepRunner('optim-stoch-constraint', grid({'beta_mean': [0.1, 0.2], 'beta_var': [0.001, 0.01]}),
+                         cache_path='sweep.jsonl')
+    runner.run().head()
+"""
+
+import hashlib
+import itertools
+import json
+import math
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from app.optims.economics import COST_SPAM
+from app.optims.registry import OPTIMIZER_CLASSES
+
+from .case_generator import ScenarioInitializer
+from .comparison import ComparisonRunner
+from .scenario_cache import ScenarioCorpus
+
+def grid(space: Dict[str, list]) -> List[dict]:
+    '''Cartesian product of the parameter values.
+    ---
+    params:
+        space: param name -> list of values
+    returns:
+        list of configurations
+    '''
+    keys = list(space)
+    return [dict(zip(keys, values)) for values in itertools.product(*(space[k] for k in keys))]
+
+
+def sample(space: Dict[str, object], n: int, seed: int = 0) -> List[dict]:
+    '''Random configurations from a search space. A (low, high) tuple is sampled
+    uniformly, log-uniformly if both bounds are positive and span more than a decade;
+    a list is sampled as a choice.
+    ---
+    params:
+        space: param name -> (low, high) or list of values
+        n: number of configurations
+        seed: sampler seed
+    returns:
+        list of configurations
+    '''
+    rng = np.random.default_rng(seed)
+    configs = []
+    for _ in range(n):
+        cfg = {}
+        for k, v in space.items():
+            if isinstance(v, tuple):
+                low, high = v
+                if low > 0 and high / low > 10:
+                    cfg[k] = float(np.exp(rng.uniform(np.log(low), np.log(high))))
+                elif isinstance(low, int) and isinstance(high, int):
+                    cfg[k] = int(rng.integers(low, high + 1))
+                else:
+                    cfg[k] = float(rng.uniform(low, high))
+            else:
+                cfg[k] = v[int(rng.integers(len(v)))]
+        configs.append(cfg)
+    return configs
+
+
+def config_key(optimizer: str, params: dict, n_cases: int, seed: int, scenarios: Optional[str] = None) -> str:
+    key = {'optimizer': optimizer, 'params': params, 'n_cases': n_cases, 'seed': seed}
+    if scenarios is not None:
+        key['scenarios'] = scenarios
+    raw = json.dumps(key, sort_keys=True)
+    return hashlib.sha1(raw.encode()).hexdigest()
+
+
+def evaluate_config(job: tuple) -> dict:
+    '''Play one configuration on n seeded cases. Runs inside pool workers.
+    ---
+    params:
+        job: (optimizer name, params, n_cases, seed, ScenarioCorpus or None)
+    returns:
+        dict with the EvaluationReport summary, or the error
+    '''
+    optimizer, params, n_cases, seed, corpus = job
+    random.seed(seed)
+    np.random.seed(seed)
+    out = {'optimizer': optimizer, 'params': params, 'n_cases': n_cases, 'seed': seed}
+    try:
+        agent = OPTIMIZER_CLASSES[optimizer](**params)
+        if corpus is not None:
+            initial_scenarios = corpus.head(n_cases)
+        else:
+            initial_scenarios = list(ScenarioInitializer(n_cases).generator())
+        runner = ComparisonRunner({'cfg': agent}, seed=seed)
+        out.update(runner.run(initial_scenarios)['cfg'].summary())
+    except Exception as e:
+        out['error'] = repr(e)
+    return out
+
+
+class SweepRunner():
+    def __init__(
+        self,
+        optimizer: str,
+        configs: List[dict],
+        min_cases: int = 10,
+        max_cases: int = 270,
+        eta: int = 3,
+        metric: str = 'profit',
+        seed: int = 0,
+        processes: Optional[int] = None,
+        cache_path: Optional[str] = None,
+        scenarios_dir: Optional[str] = None
+        ) -> None:
+        '''
+        ---
+        params:
+            optimizer: key of OPTIMIZER_CLASSES
+            configs: constructor kwargs to try, from grid() or sample()
+            min_cases: cases played on the first rung
+            max_cases: cases played on the last rung
+            eta: halving rate
+            metric: summary metric to maximize
+            seed: scenario and response seed shared by every configuration
+            processes: pool size, None for the cpu count, 1 to run in process
+            cache_path: JSONL file of finished evaluations
+            scenarios_dir: ScenarioCorpus cache; every rung plays the first cases of one
+                memory-mapped corpus instead of drawing them with ScenarioInitializer
+        '''
+        if optimizer not in OPTIMIZER_CLASSES:
+            raise ValueError(f"Unknown optimizer '{optimizer}'. Available: {sorted(OPTIMIZER_CLASSES)}")
+        self.optimizer = optimizer
+        self.configs = configs
+        self.min_cases = min_cases
+        self.max_cases = max_cases
+        self.eta = eta
+        self.metric = metric
+        self.seed = seed
+        self.processes = processes
+        self.cache_path = cache_path
+        self.scenarios_dir = scenarios_dir
+        self.corpus = None
+        self.cache = self._load_cache()
+        self.results = []
+
+    def _load_cache(self) -> Dict[str, dict]:
+        '''Finished evaluations of the cache file. A crash during an append leaves a
+        partial last line: it is cut off, so the next append starts on a fresh line, and
+        any other line that does not decode is skipped.
+        '''
+        cache = {}
+        if self.cache_path and os.path.exists(self.cache_path):
+            with open(self.cache_path, 'r+b') as f:
+                end = 0
+                for line in f:
+                    if not line.endswith(b'\n'):
+                        f.truncate(end)
+                        break
+                    end += len(line)
+                    try:
+                        rec = json.loads(line)
+                        cache[rec['key']] = rec
+                    except (ValueError, KeyError, TypeError):
+                        continue
+        return cache
+
+    def _store(self, rec: dict) -> None:
+        self.cache[rec['key']] = rec
+        if self.cache_path:
+            with open(self.cache_path, 'a') as f:
+                f.write(json.dumps(rec) + '\n')
+
+    def budgets(self) -> List[int]:
+        '''Cases per rung, growing by eta up to max_cases.
+        '''
+        out, n = [], self.min_cases
+        while n < self.max_cases:
+            out.append(n)
+            n *= self.eta
+        out.append(self.max_cases)
+        return out
+
+    def evaluate(self, configs: List[dict], n_cases: int) -> List[dict]:
+        '''Evaluate configurations on n_cases, reading and filling the cache.
+        '''
+        if self.scenarios_dir and self.corpus is None:
+            self.corpus = ScenarioCorpus.cached(self.scenarios_dir, self.max_cases, self.seed)
+        scenarios = os.path.basename(self.corpus.path) if self.corpus is not None else None
+        keys = [config_key(self.optimizer, cfg, n_cases, self.seed, scenarios) for cfg in configs]
+        todo = [(k, cfg) for k, cfg in zip(keys, configs) if k not in self.cache]
+        # a loaded corpus pickles as its path, workers map the same files
+        jobs = [(self.optimizer, cfg, n_cases, self.seed, self.corpus) for _, cfg in todo]
+        if self.processes == 1 or len(jobs) <= 1:
+            done = map(evaluate_config, jobs)
+            for (k, _), rec in zip(todo, done):
+                self._store(dict(rec, key=k))
+        else:
+            with ProcessPoolExecutor(self.processes) as pool:
+                for (k, _), rec in zip(todo, pool.map(evaluate_config, jobs)):
+                    self._store(dict(rec, key=k))
+        return [self.cache[k] for k in keys]
+
+    def _score(self, rec: dict) -> float:
+        value = rec.get(self.metric)
+        return -math.inf if 'error' in rec or value is None or np.isnan(value) else value
+
+    def run(self) -> pd.DataFrame:
+        '''Successive halving over the configurations.
+        ---
+        returns:
+            ranked table, one row per configuration at the last rung it reached
+        '''
+        survivors = list(self.configs)
+        self.results = []
+        for rung, n_cases in enumerate(self.budgets()):
+            recs = self.evaluate(survivors, n_cases)
+            ranked = sorted(zip(survivors, recs), key=lambda x: self._score(x[1]), reverse=True)
+            keep = max(1, math.ceil(len(ranked) / self.eta))
+            for i, (_, rec) in enumerate(ranked):
+                if i >= keep or n_cases == self.max_cases:
+                    self.results.append(dict(rec, rung=rung))
+            survivors = [cfg for cfg, _ in ranked[:keep]]
+            if n_cases == self.max_cases:
+                break
+        return self.table()
+
+    def table(self) -> pd.DataFrame:
+        '''Ranked table of fill rate against invitation cost.
+        '''
+        rows = []
+        for rec in self.results:
+            row = dict(rec['params'])
+            row.update({
+                'rung': rec['rung'],
+                'n_cases': rec['n_cases'],
+                'fill_rate': rec.get('fill_rate', np.nan),
+                'invitations': rec.get('invitations', np.nan),
+                'invitation_cost': COST_SPAM * rec.get('invitations', np.nan),
+                'profit': rec.get('profit', np.nan),
+                'error': rec.get('error'),
+            })
+            rows.append(row)
+        df = pd.DataFrame(rows)
+        if df.empty:
+            return df
+        df['_score'] = [self._score(r) for r in self.results]
+        return df.sort_values(['rung', '_score'], ascending=False).drop(columns='_score').reset_index(drop=True)
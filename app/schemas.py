@@ -0,0 +1,50 @@
+from datetime import datetime
+from typing import List, Optional, Union
+from pydantic import BaseModel, StrictFloat, StrictInt, conint, validator
+
+
+class ModelParams(BaseModel):
+    now: datetime
+    deadline: datetime
+    num_vacancies: int
+    num_remaining_in_pool: int
+    impacted_candidates_data: list
+
+
+class SessionDelta(BaseModel):
+    now: datetime
+    deadline: Optional[datetime] = None
+    num_vacancies: Optional[int] = None
+    num_remaining_in_pool: Optional[int] = None
+    impacts: list = []
+
+
+class StreamHeader(BaseModel):
+    now: datetime
+    deadline: datetime
+    num_vacancies: int
+    num_remaining_in_pool: int
+
+
+class ImpactRecord(BaseModel):
+    notification_status: Optional[str] = None
+    candidate_status: Optional[str] = None
+    time_to_respond_ir_minutes: Optional[Union[StrictInt, StrictFloat]] = None
+
+
+class SharedPool(BaseModel):
+    capacity: conint(ge=0)
+    openings: List[conint(ge=0)]
+
+
+class PortfolioParams(BaseModel):
+    openings: List[ModelParams]
+    pools: List[SharedPool] = []
+
+    @validator('pools', each_item=True)
+    def pool_openings_in_range(cls, pool, values):
+        n = len(values.get('openings', []))
+        out_of_range = [j for j in pool.openings if j >= n]
+        if out_of_range:
+            raise ValueError(f"Opening indexes {out_of_range} out of range for {n} openings")
+        return pool
@@ -0,0 +1,75 @@
+"""
+Stateful sessions, one per job opening, for the WebSocket route.
+
+The dispatcher opens `/sessions/{optimizer}/{correlation_prefix}` once per opening and
+then sends only what changed since the previous call: the new `now`, any scalar that
+moved, and the new or updated impact records. Records carry an `id`; a record with an
+id already seen replaces the stored one. Records without an id are always new and are
+keyed apart from the ids, as ('_anon', n). After every delta, `request` holds the
+resolved ModelParams, the body the HTTP routes would have received. The optimizer instance lives in the session,
+so stateful agents keep learning across the calls of the opening.
+"""
+
+from typing import Dict, Tuple
+
+from .optims.registry import get_optimizer
+from .schemas import ModelParams, SessionDelta
+
+
+class OpeningSession():
+    def __init__(self, optimizer: str, correlation_prefix: str) -> None:
+        '''
+        ---
+        params:
+            optimizer: route name of the agent, e.g. optim-nbinomial
+            correlation_prefix: opening id, correlation_id without the call counter
+        '''
+        self.optimizer_name = optimizer
+        self.correlation_prefix = correlation_prefix
+        self.optimizer = get_optimizer(optimizer)
+        self.impacts: Dict[object, dict] = {}
+        self.deadline = None
+        self.num_vacancies = None
+        self.num_remaining_in_pool = None
+        self.n_anonymous = 0
+        self.n_calls = 0
+        self.request = None
+
+    def apply(self, delta: SessionDelta) -> Tuple[bool, int, int]:
+        '''Fold a delta into the session state and decide.
+        ---
+        params:
+            delta: SessionDelta message
+        returns:
+            finished, num_candidates_needed, callback_time_minutes
+        '''
+        for field in ('deadline', 'num_vacancies', 'num_remaining_in_pool'):
+            value = getattr(delta, field)
+            if value is not None:
+                setattr(self, field, value)
+        if self.deadline is None or self.num_vacancies is None or self.num_remaining_in_pool is None:
+            raise ValueError("The first message must set deadline, num_vacancies and num_remaining_in_pool")
+        for record in delta.impacts:
+            record = dict(record)
+            key = record.pop('id', None)
+            if key is None:
+                key = ('_anon', self.n_anonymous)
+                self.n_anonymous += 1
+            self.impacts[key] = record
+
+        self.request = ModelParams(
+            now=delta.now,
+            deadline=self.deadline,
+            num_vacancies=self.num_vacancies,
+            num_remaining_in_pool=self.num_remaining_in_pool,
+            impacted_candidates_data=list(self.impacts.values())
+        )
+        finished, num_candidates_needed, callback_time_minutes = self.optimizer.invitation_logic_api(
+            now=self.request.now,
+            deadline=self.request.deadline,
+            num_vacancies=self.request.num_vacancies,
+            num_remaining_in_pool=self.request.num_remaining_in_pool,
+            impacted_candidates_data=self.request.impacted_candidates_data
+        )
+        self.n_calls += 1
+        return bool(finished), int(num_candidates_needed), int(callback_time_minutes)
@@ -0,0 +1,183 @@
+"""
+Shadow evaluation of candidate optimizers on live traffic.
+
+The routes always answer from their primary optimizer. After the response is decided,
+a sampled share of the requests goes on a bounded queue. A background thread replays
+each request on the candidate optimizers of its route and logs one JSON line with the
+primary and candidate decisions and timings. The request path only does a random draw
+and a non-blocking put: when the queue is full the request is dropped, never waited on.
+
+SHADOW_CONFIG holds the configuration, inline JSON or the path of a JSON file:
+
+    {"sample_rate": 0.1, "queue_size": 1000,
+     "candidates": {"optim-nbinomial": [
+         {"name": "nbinom-exp", "optimizer": "optim-exp"},
+         {"name": "nbinom-mu05", "optimizer": "optim-nbinomial", "params": {"prior_beta_mu": 0.05}}]}}
+
+A candidate without params is built like its route; with params, it is built from
+its class with these constructor kwargs.
+"""
+
+import json
+import logging
+import os
+import queue
+import random
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+from .optims.registry import build_optimizer
+
+SAMPLE_RATE = 0.1
+QUEUE_SIZE = 1000
+
+logger = logging.getLogger(__name__)
+
+
+class ShadowEvaluator():
+    def __init__(self, candidates: Dict[str, List[dict]], sample_rate: float = SAMPLE_RATE, queue_size: int = QUEUE_SIZE) -> None:
+        '''
+        ---
+        params:
+            candidates: route name -> list of {name, optimizer, params} candidate specs
+            sample_rate: share of the requests replayed, caps the CPU spent on shadows
+            queue_size: requests waiting at most; more are dropped
+        '''
+        for specs in candidates.values():
+            for spec in specs:
+                build_optimizer(spec['optimizer'], spec.get('params'))
+        self.candidates = candidates
+        self.sample_rate = sample_rate
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.thread = None
+        self.n_sampled_out = 0
+        self.n_dropped = 0
+        self.n_processed = 0
+        self.totals = defaultdict(lambda: defaultdict(float))
+
+    @classmethod
+    def from_config(cls, config: str) -> 'ShadowEvaluator':
+        '''Build from inline JSON or a JSON file path.
+        '''
+        if os.path.exists(config):
+            with open(config) as f:
+                doc = json.load(f)
+        else:
+            doc = json.loads(config)
+        return cls(doc['candidates'], doc.get('sample_rate', SAMPLE_RATE), doc.get('queue_size', QUEUE_SIZE))
+
+    def start(self) -> threading.Thread:
+        if self.thread is None or not self.thread.is_alive():
+            self.thread = threading.Thread(target=self._loop, name='shadow-evaluator', daemon=True)
+            self.thread.start()
+        return self.thread
+
+    def submit(self, route: str, params, decision: tuple, seconds: float) -> bool:
+        '''Queue a request answered by the primary optimizer. Never blocks.
+        ---
+        params:
+            route: route name, key of candidates
+            params: ModelParams of the request
+            decision: primary (finished, num_candidates_needed, callback_time_minutes)
+            seconds: primary decision time
+        returns:
+            True if queued
+        '''
+        if route not in self.candidates:
+            return False
+        if random.random() >= self.sample_rate:
+            self.n_sampled_out += 1
+            return False
+        try:
+            self.queue.put_nowait((route, params, decision, seconds))
+        except queue.Full:
+            self.n_dropped += 1
+            return False
+        return True
+
+    def evaluate(self, route: str, params, decision: tuple, seconds: float) -> dict:
+        '''Run the candidates of a route on one request.
+        ---
+        returns:
+            record with the primary and candidate decisions and timings
+        '''
+        record = {
+            'route': route,
+            'now': str(params.now),
+            'primary': {'decision': [bool(decision[0]), int(decision[1]), int(decision[2])], 'ms': 1000 * seconds},
+            'candidates': {},
+        }
+        for spec in self.candidates[route]:
+            out = {}
+            t0 = time.perf_counter()
+            try:
+                finished, num_candidates_needed, callback_time_minutes = build_optimizer(
+                    spec['optimizer'], spec.get('params')).invitation_logic_api(
+                    now=params.now,
+                    deadline=params.deadline,
+                    num_vacancies=params.num_vacancies,
+                    num_remaining_in_pool=params.num_remaining_in_pool,
+                    impacted_candidates_data=params.impacted_candidates_data
+                )
+                out['decision'] = [bool(finished), int(num_candidates_needed), int(callback_time_minutes)]
+                out['agrees'] = out['decision'] == record['primary']['decision']
+            except Exception as e:
+                out['error'] = repr(e)
+            out['ms'] = 1000 * (time.perf_counter() - t0)
+            record['candidates'][spec['name']] = out
+            self._accumulate(route, spec['name'], record['primary'], out)
+        return record
+
+    def _accumulate(self, route: str, name: str, primary: dict, out: dict) -> None:
+        t = self.totals[f'{route}/{name}']
+        t['n'] += 1
+        t['ms'] += out['ms']
+        t['primary_ms'] += primary['ms']
+        if 'error' in out:
+            t['errors'] += 1
+            return
+        t['agrees'] += out['agrees']
+        t['abs_diff_candidates'] += abs(out['decision'][1] - primary['decision'][1])
+        t['abs_diff_callback'] += abs(out['decision'][2] - primary['decision'][2])
+
+    def _loop(self) -> None:
+        while True:
+            item = self.queue.get()
+            try:
+                logger.info(f"SHADOW {json.dumps(self.evaluate(*item))}")
+            except Exception as e:
+                logger.warning(f"SHADOW failed: {e!r}")
+            self.n_processed += 1
+            self.queue.task_done()
+
+    def report(self) -> dict:
+        '''Counters, and per candidate means: agreement with the primary, decision
+        differences and timings.
+        '''
+        out = {
+            'sample_rate': self.sample_rate,
+            'queued': self.queue.qsize(),
+            'processed': self.n_processed,
+            'dropped': self.n_dropped,
+            'sampled_out': self.n_sampled_out,
+            'candidates': {},
+        }
+        for key, t in list(self.totals.items()):
+            n, ok = t['n'], t['n'] - t['errors']
+            out['candidates'][key] = {
+                'n': int(n),
+                'errors': int(t['errors']),
+                'agreement': t['agrees'] / ok if ok else None,
+                'mean_abs_diff_candidates': t['abs_diff_candidates'] / ok if ok else None,
+                'mean_abs_diff_callback': t['abs_diff_callback'] / ok if ok else None,
+                'mean_ms': t['ms'] / n,
+                'primary_mean_ms': t['primary_ms'] / n,
+            }
+        return out
+
+
+def from_env() -> Optional[ShadowEvaluator]:
+    config = os.getenv("SHADOW_CONFIG")
+    return ShadowEvaluator.from_config(config) if config else None
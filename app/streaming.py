@@ -0,0 +1,50 @@
+"""
+Streaming ingest of very large requests.
+
+The body is NDJSON, sent chunked: the first line holds the ModelParams scalars (now,
+deadline, num_vacancies, num_remaining_in_pool) and every following line one impact
+record. Records are folded into an ImpactAggregate as the chunks arrive, so memory stays
+flat whatever the size of the pool. Every line is validated first: a line that is not a
+JSON object of the expected shape raises ValidationError (a ValueError), nothing else.
+"""
+
+import json
+from typing import AsyncIterator, Optional, Tuple
+
+from .optims.utils import ImpactAggregate
+from .schemas import ImpactRecord, StreamHeader
+
+
+async def ingest_ndjson(chunks: AsyncIterator[bytes]) -> Tuple[Optional[StreamHeader], ImpactAggregate]:
+    '''Parse an NDJSON body incrementally.
+    ---
+    params:
+        chunks: body chunks, e.g. request.stream()
+    returns:
+        header: StreamHeader, None if the body was empty
+        aggregate: ImpactAggregate of the impact records
+    '''
+    header = None
+    aggregate = ImpactAggregate()
+    buffer = b''
+    async for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b'\n')
+        for line in lines:
+            header = _fold(line, header, aggregate)
+    header = _fold(buffer, header, aggregate)
+    return header, aggregate
+
+
+_decode = json.JSONDecoder().decode
+
+
+def _fold(line: bytes, header: Optional[StreamHeader], aggregate: ImpactAggregate) -> Optional[StreamHeader]:
+    line = line.strip()
+    if not line:
+        return header
+    obj = _decode(line.decode())
+    if header is None:
+        return StreamHeader.parse_obj(obj)
+    aggregate.add(ImpactRecord.parse_obj(obj).dict())
+    return header
@@ -10,6 +10,7 @@ host = os.getenv("HOST", "0.0.0.0")
 port = os.getenv("PORT", "8000")
 bind_env = os.getenv("BIND", None)
 use_loglevel = os.getenv("LOG_LEVEL", "info")
+preload_app_str = os.getenv("PRELOAD_APP", "false")
 if bind_env:
     use_bind = bind_env
 else:
@@ -30,12 +31,15 @@ workers = web_concurrency
 bind = use_bind
 keepalive = 120
 errorlog = "-"
+# The master imports the app and warms its read-only state before forking (app/preload.py)
+preload_app = preload_app_str.lower() in ("1", "true", "yes")
 
 # For debugging and testing
 log_data = {
     "loglevel": loglevel,
     "workers": workers,
     "bind": bind,
+    "preload_app": preload_app,
     # Additional, non-gunicorn variables
     "workers_per_core": workers_per_core,
     "host": host,
@@ -0,0 +1,107 @@
+"""
+Resident, proportional and unique memory per gunicorn worker, with and without pre-fork
+preloading (PRELOAD_APP, see app/preload.py). Linux only, reads /proc/<pid>/smaps_rollup.
+
+    python scripts/measure_worker_memory.py --workers 4
+"""
+
+import argparse
+import json
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+REQUEST = {
+    "now": "2021-11-01 00:00:00",
+    "deadline": "2021-11-02 00:00:00",
+    "num_vacancies": 2,
+    "num_remaining_in_pool": 500,
+    "impacted_candidates_data": [
+        {"notification_status": "ir_accepted", "candidate_status": "offer_accepted", "time_to_respond_ir_minutes": 9}
+    ],
+}
+
+
+def smaps_rollup(pid: int) -> dict:
+    '''Rss, Pss and Uss (private clean + dirty) of a process, in MiB.
+    '''
+    kb = {}
+    with open(f'/proc/{pid}/smaps_rollup') as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 3 and parts[2] == 'kB':
+                kb[parts[0].rstrip(':')] = int(parts[1])
+    return {
+        'rss': kb['Rss'] / 1024,
+        'pss': kb['Pss'] / 1024,
+        'uss': (kb['Private_Clean'] + kb['Private_Dirty']) / 1024,
+    }
+
+
+def children(pid: int) -> list:
+    out = []
+    for task in os.listdir(f'/proc/{pid}/task'):
+        with open(f'/proc/{pid}/task/{task}/children') as f:
+            out.extend(int(c) for c in f.read().split())
+    return out
+
+
+def measure(preload: bool, workers: int, port: int, n_requests: int) -> dict:
+    env = dict(os.environ, PRELOAD_APP='true' if preload else 'false', WEB_CONCURRENCY=str(workers),
+               PORT=str(port), PYTHONPATH=BASE_DIR)
+    # run outside the repo so the app log file does not land in the tree
+    with tempfile.TemporaryDirectory() as cwd:
+        proc = subprocess.Popen(
+            [sys.executable, '-m', 'gunicorn', '--worker-class', 'uvicorn.workers.UvicornWorker',
+             '--config', os.path.join(BASE_DIR, 'docker', 'gunicorn_conf.py'), 'app.main:app'],
+            cwd=cwd, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            url = f'http://127.0.0.1:{port}'
+            deadline = time.time() + 120
+            while time.time() < deadline:
+                try:
+                    if httpx.get(url + '/').status_code == 200 and len(children(proc.pid)) == workers:
+                        break
+                except httpx.HTTPError:
+                    pass
+                time.sleep(0.5)
+            with httpx.Client(base_url=url) as client:
+                for i in range(n_requests):
+                    route = ('/optim-exp/', '/optim-nbinomial/')[i % 2]
+                    client.post(route, json=REQUEST)
+            time.sleep(1)
+            rows = [smaps_rollup(pid) for pid in children(proc.pid)]
+            master = smaps_rollup(proc.pid)
+        finally:
+            proc.send_signal(signal.SIGTERM)
+            proc.wait(30)
+    total = {k: sum(r[k] for r in rows) for k in ('rss', 'pss', 'uss')}
+    return {
+        'preload': preload,
+        'workers': len(rows),
+        'worker_rss_mib': round(total['rss'] / max(len(rows), 1), 1),
+        'worker_pss_mib': round(total['pss'] / max(len(rows), 1), 1),
+        'worker_uss_mib': round(total['uss'] / max(len(rows), 1), 1),
+        'master_pss_mib': round(master['pss'], 1),
+        'total_pss_mib': round(total['pss'] + master['pss'], 1),
+    }
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Memory per gunicorn worker with and without preloading.")
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--requests', type=int, default=200)
+    args = parser.parse_args(argv)
+    for preload in (False, True):
+        print(json.dumps(measure(preload, args.workers, args.port, args.requests)))
+
+
+if __name__ == '__main__':
+    main()
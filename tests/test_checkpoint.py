@@ -0,0 +1,86 @@
+import random
+
+import numpy as np
+import pytest
+
+from app.optims.optim_nbinomial import OptimNegBinom
+from app.scenarios_generator.case_generator import CaseGenerator, ScenarioInitializer, ScenarioSimulator
+from app.scenarios_generator.checkpoint import CheckpointedSimulator, load_checkpoint, scenarios_key
+from app.scenarios_generator.evaluation import EvaluationReport
+
+
+def _run(initial, path, **kwargs):
+    random.seed(1)
+    np.random.seed(1)
+    sim = CheckpointedSimulator(ScenarioSimulator(OptimNegBinom(), CaseGenerator()), str(path), every_steps=5)
+    sim.run(initial, report=EvaluationReport(capacity=len(initial)), **kwargs)
+    return sim
+
+
+def test_resume_is_exact(tmp_path):
+    random.seed(0)
+    np.random.seed(0)
+    initial = list(ScenarioInitializer(15).generator())
+
+    full = _run(initial, tmp_path / "full.ckpt")
+    # run() returns only once the last snapshot is on disk
+    assert load_checkpoint(str(tmp_path / "full.ckpt"))["n_steps"] == full.n_steps
+    assert not (tmp_path / "full.ckpt.tmp").exists()
+
+    stopped = _run(initial, tmp_path / "run.ckpt", max_steps=23)
+    assert stopped.n_steps == 23
+    assert load_checkpoint(str(tmp_path / "run.ckpt"))["n_steps"] == 20
+
+    # a fresh process: other objects, other global random state
+    random.seed(99)
+    np.random.seed(99)
+    resumed = CheckpointedSimulator(ScenarioSimulator(OptimNegBinom(), CaseGenerator()), str(tmp_path / "run.ckpt"), every_steps=5)
+    resumed.run(initial)
+
+    assert resumed.n_steps == full.n_steps
+    a, b = full.report.to_dict(), resumed.report.to_dict()
+    for col in ["offers_accepted", "invitations", "api_calls", "time_to_fill", "profit"]:
+        np.testing.assert_array_equal(a[col], b[col])
+    assert resumed.simulator.opt_obj.nbin.alpha_posterior == full.simulator.opt_obj.nbin.alpha_posterior
+    assert resumed.stats()["written"] >= 1
+
+
+def _steps(results):
+    return [(r["correlation_id"], r["num_candidates_needed"], len(r["impacted_candidates_data"])) for r in results]
+
+
+def test_resume_keeps_steps_and_checks_scenarios(tmp_path):
+    random.seed(0)
+    np.random.seed(0)
+    initial = list(ScenarioInitializer(6).generator())
+
+    full = _run(initial, tmp_path / "full.ckpt", keep_steps=True)
+    stopped = _run(initial, tmp_path / "run.ckpt", keep_steps=True, max_steps=13)
+    state = load_checkpoint(str(tmp_path / "run.ckpt"))
+    # finished cases live in the steps file, only the current one in the snapshot
+    assert state["n_results"] + len(state["open_results"]) == 10
+    assert len(state["open_results"]) < 10
+
+    resumed = CheckpointedSimulator(ScenarioSimulator(OptimNegBinom(), CaseGenerator()), str(tmp_path / "run.ckpt"), every_steps=5)
+    results = resumed.run(initial, keep_steps=True)
+    assert _steps(results) == _steps(full.results)
+    assert all(r["optim"] is resumed.simulator.opt_obj for r in results)
+
+    other = list(ScenarioInitializer(6).generator())
+    with pytest.raises(ValueError):
+        CheckpointedSimulator(ScenarioSimulator(OptimNegBinom(), CaseGenerator()), str(tmp_path / "run.ckpt")).run(other)
+
+
+def test_snapshot_keeps_only_open_report_rows(tmp_path):
+    random.seed(0)
+    np.random.seed(0)
+    initial = list(ScenarioInitializer(15).generator())
+    stopped = _run(initial, tmp_path / "run.ckpt", max_steps=23)
+    state = load_checkpoint(str(tmp_path / "run.ckpt"))
+    assert "report" not in state and len(state["open_rows"]["names"]) == 1
+    assert state["report_rows"] >= 1 and (tmp_path / "run.ckpt.report").exists()
+
+    resumed = CheckpointedSimulator(ScenarioSimulator(OptimNegBinom(), CaseGenerator()), str(tmp_path / "run.ckpt"))
+    resumed.scenarios_key = scenarios_key(initial)
+    resumed.restore(state)
+    assert resumed.report.names == stopped.report.names[:resumed.report.n_cases]
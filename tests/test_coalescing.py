@@ -0,0 +1,49 @@
+import datetime as dt
+
+from starlette.testclient import TestClient
+
+from app import main
+from app.optims.coalescing import CallbackCoalescer
+from app.optims.optim_nbinomial import OptimNegBinom
+
+REQUEST = {
+    "now": "2021-11-01 00:07:00",
+    "deadline": "2021-11-02 00:00:00",
+    "num_vacancies": 2,
+    "num_remaining_in_pool": 500,
+    "impacted_candidates_data": [
+        {"notification_status": "ir_accepted", "candidate_status": "offer_accepted", "time_to_respond_ir_minutes": 9}
+    ],
+}
+
+
+def test_snap_respects_tolerance_and_deadline():
+    co = CallbackCoalescer(tick_minutes=15, tolerance_minutes=10)
+    assert [co.snap_minutes(0, 1000, c) for c in (13, 14, 16, 17)] == [15, 15, 15, 15]
+    # relative tolerance: a 5 minute callback may move 2.5 minutes at most
+    assert co.snap_minutes(0, 1000, 5) == 5
+    # the later boundary is past the deadline and the earlier one is now
+    assert co.snap_minutes(0, 14.5, 13) == 13
+    assert co.snap_minutes(0, 1000, 0) == 0
+
+    report = co.report()
+    assert report["callbacks"] == 6 and report["snapped_total"] == 4
+    assert report["raw_wakeups"] == 5 and report["coalesced_wakeups"] == 3
+
+    now = dt.datetime(2021, 11, 1, 0, 3, 30)
+    callback = co.snap(now, now + dt.timedelta(days=1), 40)
+    assert (now + dt.timedelta(minutes=callback)).minute == 45
+
+
+def test_batch_route_coalesces(testclient: TestClient, monkeypatch):
+    monkeypatch.setattr(main, "coalescer", CallbackCoalescer(tick_minutes=15, tolerance_minutes=10))
+    raw = OptimNegBinom().invitation_logic_api(
+        now=dt.datetime(2021, 11, 1, 0, 7), deadline=dt.datetime(2021, 11, 2), num_vacancies=2,
+        num_remaining_in_pool=500, impacted_candidates_data=REQUEST["impacted_candidates_data"])
+    response = testclient.post("/batch/optim-nbinomial/", json=[REQUEST, REQUEST])
+    assert response.status_code == 200
+    (finished, n, callback), second = response.json()
+    assert second == [finished, n, callback] and n == raw[1]
+    assert abs(callback - raw[2]) <= 10 and (7 + callback) % 15 == 0
+    assert testclient.get("/coalescing/").json()["coalesced_wakeups"] == 1
+    assert testclient.post("/batch/unknown/", json=[REQUEST]).status_code == 404
@@ -0,0 +1,18 @@
+import numpy as np
+
+from app.optims.optim_nbinomial import OptimNegBinom
+from app.scenarios_generator.case_generator import ScenarioInitializer
+from app.scenarios_generator.comparison import ComparisonRunner
+
+
+def test_identical_agents_see_identical_trajectories():
+    initial = list(ScenarioInitializer(3).generator())
+    runner = ComparisonRunner({"a": OptimNegBinom(), "b": OptimNegBinom()}, seed=7)
+    reports = runner.run(initial)
+
+    a, b = reports["a"].to_dict(), reports["b"].to_dict()
+    for col in ["offers_accepted", "invitations", "api_calls", "profit"]:
+        np.testing.assert_array_equal(a[col], b[col])
+    cmp = runner.compare("profit")
+    assert cmp.loc["b", "mean_diff"] == 0
+    assert list(runner.summary().index) == ["a", "b"]
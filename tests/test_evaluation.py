@@ -0,0 +1,29 @@
+import numpy as np
+
+from app.optims.optim_nbinomial import OptimNegBinom
+from app.scenarios_generator.case_generator import CaseGenerator, ScenarioInitializer, ScenarioSimulator
+from app.scenarios_generator.event_scheduler import EventScheduler
+
+
+def test_simulator_evaluation_matches_steps():
+    initial = list(ScenarioInitializer(3).generator())
+    sim = ScenarioSimulator(OptimNegBinom(), CaseGenerator())
+    table = sim.evaluate(initial, keep_steps=True).to_dict()
+
+    assert list(table["case"]) == ["0", "1", "2"]
+    for c in range(3):
+        steps = [r for r in sim.steps if r["correlation_id"].startswith(f"Case{c}_")]
+        assert table["api_calls"][c] == len(steps)
+        assert table["offers_accepted"][c] == steps[-1]["total_accepted"]
+        assert table["invitations"][c] == table["initial_pool"][c] - steps[-1]["num_remaining_in_pool"]
+    assert np.all((table["fill_rate"] >= 0) & (table["fill_rate"] <= 1))
+
+
+def test_scheduler_evaluation_keeps_no_steps():
+    initial = list(ScenarioInitializer(3).generator())
+    scheduler = EventScheduler(OptimNegBinom())
+    report = scheduler.evaluate(initial)
+    assert scheduler.steps == []
+    assert report.n_cases == 3
+    assert report.summary()["api_calls"] > 0
+    assert len(report.to_frame()) == 3
@@ -0,0 +1,74 @@
+import datetime as dt
+
+import random
+
+import numpy as np
+
+from app.optims.optim_nbinomial import OptimNegBinom
+from app.scenarios_generator.case_generator import FIRST_CALLBACK_MINUTES, CaseGenerator, ScenarioInitializer, ScenarioSimulator
+from app.scenarios_generator.evaluation import EvaluationReport
+from app.scenarios_generator.event_scheduler import EventScheduler
+
+
+def test_event_scheduler_interleaves_cases():
+    initial = list(ScenarioInitializer(4).generator())
+    scheduler = EventScheduler(OptimNegBinom())
+    out = scheduler.generator(initial)
+
+    minutes = [r["virtual_minute"] for r in out]
+    assert minutes == sorted(minutes)
+    assert {r["correlation_id"].split("_")[0] for r in out} == {f"Case{c}" for c in range(4)}
+    assert scheduler.n_batches <= scheduler.n_events == len(out)
+
+    last = {}
+    for r in out:
+        last[r["correlation_id"].split("_")[0]] = r
+    for r in last.values():
+        accepted = sum(i["candidate_status"] == "offer_accepted" for i in r["impacted_candidates_data"])
+        assert r["total_accepted"] == accepted
+
+
+def test_event_scheduler_until():
+    initial = list(ScenarioInitializer(2).generator())
+    out = EventScheduler(OptimNegBinom()).generator(initial, until=FIRST_CALLBACK_MINUTES)
+    assert out and all(r["virtual_minute"] == FIRST_CALLBACK_MINUTES for r in out)
+
+
+def test_engines_share_the_clock():
+    random.seed(0)
+    np.random.seed(0)
+    initial = list(ScenarioInitializer(1).generator())
+
+    random.seed(3)
+    np.random.seed(3)
+    sequential = EvaluationReport(capacity=1)
+    ScenarioSimulator(OptimNegBinom(), CaseGenerator()).generator(initial, report=sequential, keep_steps=False)
+    random.seed(3)
+    np.random.seed(3)
+    scheduled = EventScheduler(OptimNegBinom()).evaluate(initial, stop_when_filled=False)
+
+    a, b = sequential.to_dict(), scheduled.to_dict()
+    for col in ["api_calls", "minutes_elapsed", "time_to_fill", "invitations"]:
+        np.testing.assert_array_equal(a[col], b[col])
+
+
+def test_negbinom_batch_matches_loop():
+    now, deadline = dt.datetime(2021, 11, 1), dt.datetime(2021, 11, 2)
+    accepted = {"notification_status": "ir_accepted", "candidate_status": "offer_rejected", "time_to_respond_ir_minutes": 9}
+    rejected = {"notification_status": "ir_rejected", "candidate_status": "offer_rejected", "time_to_respond_ir_minutes": 3}
+    hired = dict(accepted, candidate_status="offer_accepted", time_to_respond_ir_minutes=20)
+    base = {"now": now, "deadline": deadline, "num_vacancies": 2, "num_remaining_in_pool": 500}
+    requests = [
+        dict(base, impacted_candidates_data=[]),
+        dict(base, impacted_candidates_data=[accepted, rejected, hired]),
+        dict(base, impacted_candidates_data=[accepted, accepted, rejected, hired]),
+        dict(base, impacted_candidates_data=[hired, hired]),
+        dict(base, num_remaining_in_pool=3, impacted_candidates_data=[rejected]),
+        dict(base, num_remaining_in_pool=0, impacted_candidates_data=[accepted]),
+        dict(base, now=deadline, impacted_candidates_data=[accepted]),
+    ]
+
+    loop = [OptimNegBinom().invitation_logic_api(**req) for req in requests]
+    assert len(set(loop)) >= 4
+    assert OptimNegBinom().invitation_logic_batch(requests) == loop
+    assert OptimNegBinom().invitation_logic_batch([]) == []
@@ -0,0 +1,14 @@
+import asyncio
+
+import httpx
+
+from app.main import app
+from app.scenarios_generator.load_driver import LoadDriver
+
+
+def test_load_driver_in_process():
+    driver = LoadDriver(endpoints=["/optim-nbinomial/"], n_openings=4, concurrency=2, speedup=1e9, max_steps=3)
+    report = asyncio.run(driver.run("http://testserver", transport=httpx.ASGITransport(app=app)))
+    stats = report["/optim-nbinomial/"]
+    assert stats["requests"] >= 4
+    assert stats["errors"] == 0
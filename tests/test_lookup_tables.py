@@ -0,0 +1,46 @@
+import datetime as dt
+
+import numpy as np
+
+from app.optims.lookup_tables import (
+    DecisionTable, OptimExpLookup, OptimNegBinomLookup, accuracy_report, build_exp_table, build_nbinom_table
+)
+from app.optims.registry import get_optimizer
+from app.optims.optim_exp import OptimExp
+from app.optims.optim_nbinomial import OptimNegBinom
+
+
+def test_nbinom_table_roundtrip_and_lookup(tmp_path):
+    table = build_nbinom_table(np.geomspace(1.01, 1e3, 256), np.geomspace(1, 1e5, 256))
+    table.save(str(tmp_path / "nb"))
+    loaded = DecisionTable.load(str(tmp_path / "nb"))
+    assert isinstance(loaded.values, np.memmap)
+
+    live, lookup = OptimNegBinom(), OptimNegBinomLookup(loaded)
+    a, b = loaded.axes[0][40], loaded.axes[1][200]
+    for opt in (live.nbin, lookup.nbin):
+        opt.alpha_posterior, opt.beta_posterior = a, b
+    assert round(lookup.nbin.ppmean()) == round(live.nbin.ppmean())
+
+
+def test_default_nbinom_grid_accuracy():
+    report = accuracy_report(build_nbinom_table(), n=500)
+    assert report["interpolated_match"] >= 0.95
+    assert report["interpolated_median_rel_err"] < 1e-3
+
+
+def test_routes_serve_live_models():
+    assert type(get_optimizer("optim-nbinomial")) is OptimNegBinom
+    assert type(get_optimizer("optim-exp")) is OptimExp
+
+
+def test_exp_lookup_matches_live_on_grid():
+    t_axis = np.array([600.0, 1440.0, 4000.0])
+    m_axis = np.array([-60.0, 0.0, 60.0])
+    table = build_exp_table(t_diff_axis=t_axis, m_init_axis=m_axis)
+    live, lookup = OptimExp(), OptimExpLookup(table, interpolate=False)
+    init = dt.datetime(2022, 3, 1)
+    for t in t_axis:
+        for m in m_axis:
+            now, deadline = init + dt.timedelta(minutes=m), init + dt.timedelta(minutes=t)
+            assert lookup.frequency(18, now, deadline, init) == live.frequency(18, now, deadline, init)
@@ -0,0 +1,67 @@
+import numpy as np
+import pytest
+from starlette.testclient import TestClient
+
+from app.optims import prior_refresh, registry
+from app.optims.optim_portfolio import OptimPortfolio, pool_matrix
+from app.optims.prior_refresh import Prior
+
+OPENING = {
+    "now": "2021-11-01 00:00:00",
+    "deadline": "2021-11-02 00:00:00",
+    "num_vacancies": 2,
+    "num_remaining_in_pool": 100,
+    "impacted_candidates_data": [],
+}
+
+
+def test_closed_form_without_shared_pools():
+    x = OptimPortfolio().allocate(np.array([0.2, 0.5, 0.005]), np.array([2, 2, 2]), np.array([100, 3, 100]))
+    # bounded by vacancies / p, by the own pool, and nothing when the margin is negative
+    assert x.tolist() == [10, 3, 0]
+
+
+def test_shared_pool_capacity_is_respected():
+    opt = OptimPortfolio()
+    p = np.array([0.2, 0.3, 0.25])
+    pools = pool_matrix([[0, 1], [1, 2]], 3)
+    x = opt.allocate(p, np.array([4, 4, 4]), np.array([100, 100, 100]), pools, np.array([15, 12]))
+    assert (pools @ x <= np.array([15, 12])).all()
+    # opening 1 pays the most per invitation but uses up both pools at once
+    assert x.tolist() == [15, 0, 12]
+
+
+def test_portfolio_route_marks_finished_openings(testclient: TestClient):
+    expired = dict(OPENING, now="2021-11-03 00:00:00")
+    response = testclient.post("/optim-portfolio/", json={
+        "openings": [OPENING, expired, OPENING],
+        "pools": [{"capacity": 5, "openings": [0, 2]}],
+    })
+    assert response.status_code == 200
+    (f0, n0, _), finished, (f2, n2, _) = response.json()
+    assert finished == [True, 0, 0]
+    assert not f0 and not f2 and n0 + n2 <= 5
+
+
+def test_portfolio_route_rejects_bad_pools(testclient: TestClient, monkeypatch):
+    for pool in ({"capacity": 5, "openings": [0, 2]}, {"capacity": 5, "openings": [-1]}, {"capacity": -1, "openings": [0]}):
+        response = testclient.post("/optim-portfolio/", json={"openings": [OPENING, OPENING], "pools": [pool]})
+        assert response.status_code == 422
+
+    def failed(*args, **kwargs):
+        raise ValueError("Portfolio LP failed: numerical difficulties")
+
+    monkeypatch.setattr(OptimPortfolio, "allocate", failed)
+    response = testclient.post("/optim-portfolio/", json={"openings": [OPENING]})
+    assert response.status_code == 422 and "LP failed" in response.json()["detail"]
+
+
+def test_posterior_p_uses_the_impact_data(monkeypatch):
+    accepted = {"notification_status": "ir_accepted", "candidate_status": "offer_accepted", "time_to_respond_ir_minutes": 9}
+    rejected = {"notification_status": "ir_rejected", "candidate_status": "cancelled", "time_to_respond_ir_minutes": 3}
+    opt = OptimPortfolio()
+    assert opt.posterior_p([]) == pytest.approx(0.2)
+    assert opt.posterior_p([accepted] * 5 + [rejected]) > 0.2 > opt.posterior_p([accepted] + [rejected] * 50)
+
+    monkeypatch.setattr(prior_refresh.priors, "prior", Prior(0.05, 0.0002, 11.8, 224.0, 40))
+    assert registry.optim_portfolio().posterior_p([]) == pytest.approx(0.05)
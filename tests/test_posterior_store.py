@@ -0,0 +1,28 @@
+import numpy as np
+
+from app.optims.homework import NegativeBinomial
+from app.optims.optim_nbinomial import PRIOR_BETA_MU, PRIOR_BETA_VAR
+from app.optims.posterior_store import NegativeBinomialStore
+
+
+def test_store_matches_scalar_models():
+    models = [NegativeBinomial(PRIOR_BETA_MU, PRIOR_BETA_VAR, nbin_r=1) for _ in range(3)]
+    store = NegativeBinomialStore(capacity=1)
+    idx = store.add(PRIOR_BETA_MU, PRIOR_BETA_VAR, nbin_r=1, n=3)
+    assert list(idx) == [0, 1, 2] and len(store) == 3
+
+    models[0].update(12)
+    models[2].update(30)
+    models[2].update(4)
+    store.update([0, 2, 2], [12, 30, 4])
+
+    x = np.arange(5)
+    for i, m in enumerate(models):
+        assert np.isclose(store.ppmean()[i], m.ppmean())
+        np.testing.assert_allclose(store.pppdf(x)[i], m.pppdf(x))
+        assert store.to_model(i).n_samples == m.n_samples
+    np.testing.assert_allclose(NegativeBinomialStore.from_models(models).ppmean(), store.ppmean())
+    assert store.rvs([0, 1], random_state=0).shape == (2,)
+    assert list(store.num_candidates_needed([500, 3, 500], idx=[0, 1, 2])) == [
+        min(round(m.ppmean()), pool) for m, pool in zip(models, [500, 3, 500])
+    ]
@@ -0,0 +1,42 @@
+import gc
+
+from app import preload
+from app.optims import prior_refresh
+from app.optims.prior_refresh import Prior, write_prior
+
+
+def test_warm_loads_prior_and_freezes(tmp_path, monkeypatch):
+    path = tmp_path / "priors.json"
+    write_prior(Prior(0.05, 0.0002, 11.8, 224.0, 40), str(path))
+    holder = prior_refresh.PriorHolder()
+    monkeypatch.setattr(preload, "priors", holder)
+    try:
+        out = preload.warm(priors_path=str(path))
+        assert out["prior"] is True and holder.current().mu == 0.05
+        assert {"optim-exp", "optim-nbinomial"} <= set(out["optimizers"])
+        assert out["frozen_objects"] > 0
+        # unchanged file: the worker startup hook does not replace the preloaded prior
+        assert holder.check(str(path)) is False
+    finally:
+        gc.unfreeze()
+
+
+def test_preload_enabled(monkeypatch):
+    monkeypatch.setenv("PRELOAD_APP", "true")
+    assert preload.preload_enabled()
+    monkeypatch.setenv("PRELOAD_APP", "0")
+    assert not preload.preload_enabled()
+
+
+def test_malformed_priors_fall_back_to_constants(tmp_path, monkeypatch):
+    holder = prior_refresh.PriorHolder()
+    monkeypatch.setattr(preload, "priors", holder)
+    for body in ("{not json", '{"mu": 0.05}'):
+        path = tmp_path / "priors.json"
+        path.write_text(body)
+        assert holder.load(str(path)) is False
+        assert holder.current() is None
+    try:
+        assert preload.warm(priors_path=str(path))["prior"] is False
+    finally:
+        gc.unfreeze()
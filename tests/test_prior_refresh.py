@@ -0,0 +1,47 @@
+import json
+
+import numpy as np
+
+from app.optims.prior_refresh import PriorHolder, estimate_prior, opening_outcome, refresh
+from app.optims.registry import get_optimizer
+from app.optims import prior_refresh
+
+
+def test_estimate_prior_recovers_beta():
+    rng = np.random.default_rng(0)
+    p = rng.beta(8, 150, size=2000)
+    n = rng.integers(50, 300, size=2000)
+    prior = estimate_prior(zip(n, rng.binomial(n, p)))
+    assert abs(prior.mu - 8 / 158) < 0.003
+    assert prior.alpha > 0 and prior.beta > 0
+    assert estimate_prior([(10, 1)]) is None
+
+
+def test_refresh_and_hot_swap(tmp_path, monkeypatch):
+    capture = tmp_path / "capture.jsonl"
+    with capture.open("w") as f:
+        for i in range(30):
+            impacts = [{"notification_status": "ir_accepted", "candidate_status": "offer_accepted",
+                        "time_to_respond_ir_minutes": 5}] * (1 + i % 3)
+            impacts += [{"notification_status": "ir_rejected", "candidate_status": "cancelled",
+                         "time_to_respond_ir_minutes": 5}] * 20
+            f.write(json.dumps({"now": "2021-11-02 00:00:00", "deadline": "2021-11-02 00:00:00",
+                                "num_vacancies": 5, "num_remaining_in_pool": 10,
+                                "impacted_candidates_data": impacts}) + "\n")
+        # still running: not an outcome
+        running = {"now": "2021-11-01 00:00:00", "deadline": "2021-11-02 00:00:00",
+                   "num_vacancies": 5, "num_remaining_in_pool": 10, "impacted_candidates_data": impacts}
+        f.write(json.dumps(running) + "\n")
+    assert opening_outcome(running) is None
+
+    out = tmp_path / "priors.json"
+    prior = refresh([str(capture)], str(out))
+    assert prior.n_openings == 30
+
+    holder = PriorHolder()
+    assert holder.check(str(out)) is True
+    assert holder.check(str(out)) is False
+    assert holder.current().mu == prior.mu
+
+    monkeypatch.setattr(prior_refresh.priors, "prior", holder.current())
+    assert get_optimizer("optim-nbinomial").nbin.mu == prior.mu
@@ -0,0 +1,76 @@
+import json
+
+from app.scenarios_generator.replay import iter_requests, parse_line, replay
+
+REQ = {
+    "now": "2021-11-01 00:00:00",
+    "deadline": "2021-11-02 00:00:00",
+    "num_vacancies": 5,
+    "num_remaining_in_pool": 500,
+    "impacted_candidates_data": [],
+}
+
+
+def test_parse_log_and_jsonl_lines():
+    assert parse_line(f"03:19:31,772 app.main INFO POST REQ {REQ!r}.") == REQ
+    assert parse_line(json.dumps(REQ)) == REQ
+    assert parse_line("09:06:38,205 app.main INFO POST REQ {'param1': 11, 'param2': 2}") is None
+    assert parse_line("09:03:24,298 uvicorn.error INFO Started server process") is None
+
+
+def test_replay_compares_targets(tmp_path):
+    capture = tmp_path / "log"
+    capture.write_text(
+        f"03:19:31,772 app.main INFO POST REQ {REQ!r}.\n"
+        "09:03:24,298 uvicorn.error INFO Started server process\n"
+        + json.dumps(REQ) + "\n"
+    )
+    assert len(list(iter_requests(str(capture)))) == 2
+
+    report = replay(str(capture), ["optim-nbinomial", "optim-exp"], out_path=str(tmp_path / "out.jsonl"))
+    summary = report.summary()
+    assert report.n_requests == 2
+    assert summary["optim-nbinomial"]["agreement"] == 1.0
+    assert summary["optim-exp"]["errors"] == 0
+    assert len((tmp_path / "out.jsonl").read_text().splitlines()) == 2
+
+
+def test_limit_stops_reading(tmp_path, monkeypatch):
+    from app.scenarios_generator import replay as replay_module
+
+    read = []
+
+    def requests(path):
+        for i in range(100):
+            read.append(i)
+            yield REQ
+
+    monkeypatch.setattr(replay_module, "iter_requests", requests)
+    assert replay("capture", ["optim-exp"], limit=3).n_requests == 3
+    assert len(read) == 3
+
+
+def test_batch_portfolio_and_stream_requests_are_replayable(testclient, tmp_path, caplog):
+    impacts = [
+        {"notification_status": "ir_accepted", "candidate_status": "offer_accepted", "time_to_respond_ir_minutes": 9},
+        {"notification_status": "ir_pending", "candidate_status": "not_in_ft", "time_to_respond_ir_minutes": 70},
+        {"notification_status": "ir_accepted", "candidate_status": "cancelled", "time_to_respond_ir_minutes": 3},
+        {"notification_status": "ir_accepted", "candidate_status": "offer_accepted", "time_to_respond_ir_minutes": 5},
+    ]
+    opening = dict(REQ, impacted_candidates_data=impacts)
+    header = {k: v for k, v in REQ.items() if k != "impacted_candidates_data"}
+    body = "\n".join(json.dumps(r) for r in [header] + impacts).encode()
+    with caplog.at_level("INFO", logger="app.main"):
+        assert testclient.post("/batch/optim-nbinomial/", json=[REQ, opening]).status_code == 200
+        assert testclient.post("/optim-portfolio/", json={"openings": [opening, REQ]}).status_code == 200
+        streamed = testclient.post("/stream/optim-exp/", content=body).json()
+    capture = tmp_path / "log"
+    capture.write_text("".join(f"{r.getMessage()}\n" for r in caplog.records))
+
+    requests = list(iter_requests(str(capture)))
+    assert [len(r["impacted_candidates_data"]) for r in requests] == [0, 4, 4, 0, 4]
+    assert requests[1] == requests[2] == opening
+    report = replay(str(capture), ["optim-exp"], out_path=str(tmp_path / "out.jsonl"))
+    assert report.n_requests == 5
+    decision = json.loads((tmp_path / "out.jsonl").read_text().splitlines()[-1])
+    assert decision["results"]["optim-exp"]["decision"] == streamed
@@ -0,0 +1,45 @@
+import copy
+import pickle
+
+import numpy as np
+
+from app.optims.optim_nbinomial import OptimNegBinom
+from app.scenarios_generator.case_generator import CaseGenerator, ScenarioSimulator
+from app.scenarios_generator.scenario_cache import ScenarioCorpus
+from app.scenarios_generator.sweep import SweepRunner
+
+
+def test_corpus_is_cached_and_memory_mapped(tmp_path):
+    corpus = ScenarioCorpus.cached(str(tmp_path), n_cases=50, seed=3)
+    assert isinstance(corpus.columns["num_remaining_in_pool"], np.memmap)
+    assert len(list(tmp_path.iterdir())) == 1
+
+    again = ScenarioCorpus.cached(str(tmp_path), n_cases=50, seed=3)
+    assert again.path == corpus.path and list(again) == list(corpus)
+    assert ScenarioCorpus.cached(str(tmp_path), n_cases=50, seed=4)[0] != corpus[0]
+
+    (event,) = corpus[7]
+    assert event["correlation_id"] == "Case7_0" and event["impacted_candidates_data"] == []
+    assert event["reference_date_time"].minute == 1 and event["deadline"] >= event["reference_date_time"].replace(minute=0)
+
+
+def test_corpus_is_shared_not_copied(tmp_path):
+    corpus = ScenarioCorpus.cached(str(tmp_path), n_cases=20, seed=0)
+    assert copy.deepcopy(corpus) is corpus
+    # events are fresh on every read, so in place mutation does not leak between runs
+    corpus[0][0]["impacted_candidates_data"].append({})
+    assert corpus[0][0]["impacted_candidates_data"] == []
+
+    head = pickle.loads(pickle.dumps(corpus.head(5)))
+    assert len(head) == 5 and list(head) == list(corpus)[:5]
+
+    sim = ScenarioSimulator(OptimNegBinom(), CaseGenerator(seed=0))
+    assert sim.evaluate(corpus.head(3)).n_cases == 3
+
+
+def test_sweep_on_corpus(tmp_path):
+    runner = SweepRunner("optim-nbinomial", [{"prior_beta_mu": 0.04}, {"prior_beta_mu": 0.2}],
+                         min_cases=2, max_cases=4, eta=2, processes=1, scenarios_dir=str(tmp_path))
+    table = runner.run()
+    assert len(table) == 2 and table["error"].isna().all()
+    assert runner.corpus.path.startswith(str(tmp_path))
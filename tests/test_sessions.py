@@ -0,0 +1,80 @@
+from starlette.testclient import TestClient
+
+from app import main, sessions
+from app.optims.coalescing import CallbackCoalescer
+from app.optims.optim_nbinomial import OptimNegBinom
+from app.scenarios_generator.replay import iter_requests
+from app.schemas import SessionDelta
+from app.sessions import OpeningSession
+from app.shadow import ShadowEvaluator
+
+HEADER = {
+    "now": "2021-11-01 00:00:00",
+    "deadline": "2021-11-02 00:00:00",
+    "num_vacancies": 2,
+    "num_remaining_in_pool": 500,
+}
+ACCEPTED = {"notification_status": "ir_accepted", "candidate_status": "offer_accepted", "time_to_respond_ir_minutes": 9}
+PENDING = {"notification_status": "ir_pending", "candidate_status": "not_in_ft", "time_to_respond_ir_minutes": 7}
+
+
+def test_session_sends_only_deltas(testclient: TestClient):
+    with testclient.websocket_connect("/sessions/optim-nbinomial/Case1") as ws:
+        ws.send_json(dict(HEADER, impacts=[]))
+        assert ws.receive_json() == list(OptimNegBinom().invitation_logic_api(
+            now=HEADER["now"], deadline=HEADER["deadline"], num_vacancies=2,
+            num_remaining_in_pool=500, impacted_candidates_data=[]))
+
+        ws.send_json({"now": "2021-11-01 00:10:00", "num_remaining_in_pool": 480,
+                      "impacts": [dict(PENDING, id=1), dict(ACCEPTED, id=2)]})
+        finished, _, _ = ws.receive_json()
+        assert finished is False
+
+        # candidate 1 answers: the changed record replaces the stored one and fills the opening
+        ws.send_json({"now": "2021-11-01 00:20:00", "impacts": [dict(ACCEPTED, id=1)]})
+        assert ws.receive_json() == [True, 0, 0]
+
+
+def test_session_rejects_incomplete_first_message(testclient: TestClient):
+    with testclient.websocket_connect("/sessions/optim-nbinomial/Case2") as ws:
+        ws.send_json({"now": "2021-11-01 00:00:00"})
+        assert "error" in ws.receive_json()
+
+
+def test_records_without_id_do_not_collide():
+    session = OpeningSession("optim-nbinomial", "Case3")
+    session.apply(SessionDelta(**dict(HEADER, impacts=[PENDING, PENDING])))
+    session.apply(SessionDelta(now="2021-11-01 00:10:00", impacts=[dict(ACCEPTED, id=0), dict(ACCEPTED, id=1), PENDING]))
+    assert len(session.impacts) == 5
+
+
+class FailingOptimizer():
+    def invitation_logic_api(self, **kwargs):
+        raise RuntimeError("solver crashed")
+
+
+def test_optimizer_error_keeps_the_session_open(testclient: TestClient, monkeypatch):
+    monkeypatch.setattr(sessions, "get_optimizer", lambda name: FailingOptimizer())
+    with testclient.websocket_connect("/sessions/optim-nbinomial/Case4") as ws:
+        ws.send_json(dict(HEADER, impacts=[]))
+        assert "solver crashed" in ws.receive_json()["error"]
+        ws.send_json({"now": "2021-11-01 00:10:00", "impacts": []})
+        assert "error" in ws.receive_json()
+
+
+def test_session_calls_are_logged_coalesced_and_shadowed(testclient: TestClient, monkeypatch, caplog, tmp_path):
+    monkeypatch.setattr(main, "coalescer", CallbackCoalescer(tick_minutes=15, tolerance_minutes=10))
+    shadow = ShadowEvaluator({"optim-nbinomial": [{"name": "exp", "optimizer": "optim-exp"}]}, sample_rate=1)
+    monkeypatch.setattr(main, "shadow", shadow)
+    impacts = [dict(PENDING, id=1), dict(ACCEPTED, id=2), dict(PENDING, id=3)]
+    with caplog.at_level("INFO", logger="app.main"):
+        with testclient.websocket_connect("/sessions/optim-nbinomial/Case5") as ws:
+            ws.send_json(dict(HEADER, now="2021-11-01 00:07:00", impacts=impacts))
+            finished, _, callback = ws.receive_json()
+    assert not finished and (7 + callback) % 15 == 0
+    assert shadow.queue.qsize() == 1
+
+    capture = tmp_path / "log"
+    capture.write_text("".join(f"{r.getMessage()}\n" for r in caplog.records))
+    (request,) = iter_requests(str(capture))
+    assert request["num_vacancies"] == 2 and len(request["impacted_candidates_data"]) == 3
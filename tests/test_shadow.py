@@ -0,0 +1,49 @@
+from starlette.testclient import TestClient
+
+from app import main
+from app.schemas import ModelParams
+from app.shadow import ShadowEvaluator
+
+REQUEST = {
+    "now": "2021-11-01 00:00:00",
+    "deadline": "2021-11-02 00:00:00",
+    "num_vacancies": 2,
+    "num_remaining_in_pool": 500,
+    "impacted_candidates_data": [
+        {"notification_status": "ir_accepted", "candidate_status": "offer_accepted", "time_to_respond_ir_minutes": 9}
+    ],
+}
+CANDIDATES = {"optim-nbinomial": [
+    {"name": "same", "optimizer": "optim-nbinomial"},
+    {"name": "exp", "optimizer": "optim-exp", "params": {"is_decay": True}},
+]}
+
+
+def test_queue_drops_instead_of_blocking():
+    shadow = ShadowEvaluator(CANDIDATES, sample_rate=1, queue_size=1)
+    params = ModelParams(**REQUEST)
+    assert shadow.submit("optim-nbinomial", params, (False, 1, 9), 0.001)
+    assert not shadow.submit("optim-nbinomial", params, (False, 1, 9), 0.001)
+    assert not shadow.submit("optim-exp", params, (False, 1, 9), 0.001)
+    assert shadow.n_dropped == 1
+
+    off = ShadowEvaluator(CANDIDATES, sample_rate=0)
+    assert not off.submit("optim-nbinomial", params, (False, 1, 9), 0.001)
+    assert off.n_sampled_out == 1
+
+
+def test_route_answers_from_primary_and_logs_candidates(testclient: TestClient, monkeypatch):
+    shadow = ShadowEvaluator(CANDIDATES, sample_rate=1)
+    shadow.start()
+    monkeypatch.setattr(main, "shadow", shadow)
+    primary = testclient.post("/optim-nbinomial/", json=REQUEST).json()
+    shadow.queue.join()
+
+    report = testclient.get("/shadow/").json()
+    assert report["processed"] == 1 and report["dropped"] == 0
+    assert report["candidates"]["optim-nbinomial/same"]["agreement"] == 1
+    assert report["candidates"]["optim-nbinomial/exp"]["n"] == 1
+
+    record = shadow.evaluate("optim-nbinomial", ModelParams(**REQUEST), tuple(primary), 0.001)
+    assert record["primary"]["decision"] == primary
+    assert record["candidates"]["same"]["decision"] == primary
@@ -0,0 +1,70 @@
+import datetime as dt
+import json
+import random
+
+from starlette.testclient import TestClient
+
+from app.optims.optim_exp import OptimExp
+from app.optims.optim_nbinomial import OptimNegBinom
+from app.optims.utils import DataImpactSerializer, ImpactAggregate
+
+STATUSES = [("ir_pending", "not_in_ft"), ("ir_accepted", "offer_accepted"),
+            ("ir_accepted", "cancelled"), ("ir_rejected", "cancelled")]
+
+
+def impacts(n, seed=0):
+    rng = random.Random(seed)
+    out = []
+    for _ in range(n):
+        notification, candidate = rng.choice(STATUSES)
+        out.append({"notification_status": notification, "candidate_status": candidate,
+                    "time_to_respond_ir_minutes": rng.randint(0, 60)})
+    return out
+
+
+def test_aggregate_matches_list_serializer():
+    now = dt.datetime(2022, 1, 1)
+    for data in (impacts(0), impacts(2), impacts(50)):
+        agg = ImpactAggregate.from_list(data)
+        d = DataImpactSerializer
+        assert d.get_total_pool(10, agg) == d.get_total_pool(10, data)
+        assert d.get_init_ts(now, agg) == d.get_init_ts(now, data)
+        assert d.get_n_first_accepted(agg) == d.get_n_first_accepted(data)
+        assert list(d.get_t_response_accepted(agg)) == list(d.get_t_response_accepted(data))
+        assert d.get_avg_t_response_accepted(agg, 7) == d.get_avg_t_response_accepted(data, 7)
+        assert d.get_total_contract_accepted(agg) == d.get_total_contract_accepted(data)
+
+
+def test_stream_route_matches_json_route(testclient: TestClient):
+    header = {"now": "2021-11-01T00:00:00", "deadline": "2021-11-02T00:00:00",
+              "num_vacancies": 50, "num_remaining_in_pool": 500}
+    data = impacts(300, seed=3)
+    body = "\n".join(json.dumps(x) for x in [header] + data).encode()
+    chunks = (body[i:i + 1000] for i in range(0, len(body), 1000))
+
+    r = testclient.post("/stream/optim-nbinomial/", content=chunks)
+    assert r.status_code == 200, r.text
+    assert r.json() == list(OptimNegBinom().invitation_logic_api(
+        now=dt.datetime(2021, 11, 1), deadline=dt.datetime(2021, 11, 2), num_vacancies=50,
+        num_remaining_in_pool=500, impacted_candidates_data=data))
+
+    r = testclient.post("/stream/optim-exp/", content=body)
+    assert r.json() == list(OptimExp().invitation_logic_api(
+        now=dt.datetime(2021, 11, 1), deadline=dt.datetime(2021, 11, 2), num_vacancies=50,
+        num_remaining_in_pool=500, impacted_candidates_data=data))
+
+    assert testclient.post("/stream/optim-nbinomial/", content=b"").status_code == 422
+
+
+def test_stream_route_rejects_malformed_lines(testclient: TestClient):
+    header = json.dumps({"now": "2021-11-01T00:00:00", "deadline": "2021-11-02T00:00:00",
+                         "num_vacancies": 5, "num_remaining_in_pool": 500})
+    record = {"notification_status": "ir_accepted", "candidate_status": "offer_accepted", "time_to_respond_ir_minutes": 9}
+    for body in (
+        f"{header}\n[1]",
+        f"{header}\n3",
+        "[1]\n" + json.dumps(record),
+        f"{header}\n" + json.dumps(dict(record, time_to_respond_ir_minutes="9")),
+        f"{header}\n{{not json",
+    ):
+        assert testclient.post("/stream/optim-nbinomial/", content=body.encode()).status_code == 422, body
@@ -0,0 +1,41 @@
+import json
+
+from app.scenarios_generator.sweep import SweepRunner, grid, sample
+
+
+def test_grid_and_sample():
+    assert len(grid({"a": [1, 2], "b": [0.1, 0.2, 0.3]})) == 6
+    configs = sample({"prior_beta_mu": (0.01, 0.2), "is_decay": [True, False]}, 5, seed=1)
+    assert len(configs) == 5
+    assert all(0.01 <= c["prior_beta_mu"] <= 0.2 for c in configs)
+
+
+def test_successive_halving_resumes_from_cache(tmp_path):
+    cache = tmp_path / "sweep.jsonl"
+    configs = grid({"prior_beta_mu": [0.02, 0.04, 0.2], "prior_beta_var": [0.00014]})
+    runner = SweepRunner("optim-nbinomial", configs, min_cases=2, max_cases=4, eta=2, processes=1, cache_path=str(cache))
+    assert runner.budgets() == [2, 4]
+
+    table = runner.run()
+    assert len(table) == 3
+    assert table.loc[0, "n_cases"] == 4
+    n_lines = len(cache.read_text().splitlines())
+    assert n_lines == 3 + 2
+
+    rerun = SweepRunner("optim-nbinomial", configs, min_cases=2, max_cases=4, eta=2, processes=1, cache_path=str(cache))
+    assert rerun.run().equals(table)
+    assert len(cache.read_text().splitlines()) == n_lines
+
+
+def test_cache_survives_a_partial_last_line(tmp_path):
+    cache = tmp_path / "sweep.jsonl"
+    configs = grid({"prior_beta_mu": [0.02, 0.2], "prior_beta_var": [0.00014]})
+    table = SweepRunner("optim-nbinomial", configs, min_cases=2, max_cases=2, processes=1, cache_path=str(cache)).run()
+    lines = cache.read_text().splitlines()
+    # a crash while appending the second record
+    cache.write_text(lines[0] + "\n" + lines[1][:len(lines[1]) // 2])
+
+    rerun = SweepRunner("optim-nbinomial", configs, min_cases=2, max_cases=2, processes=1, cache_path=str(cache))
+    assert len(rerun.cache) == 1
+    assert rerun.run().equals(table)
+    assert len({json.loads(line)["key"] for line in cache.read_text().splitlines()}) == 2